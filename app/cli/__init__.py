@@ -0,0 +1,4 @@
+"""
+CLI Module
+Interactive helpers shared by the command line scripts.
+"""
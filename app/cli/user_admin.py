@@ -0,0 +1,208 @@
+"""
+User Administration Utilities
+Shared account creation logic for the create_admin and create_vm_admin scripts
+"""
+
+import csv
+import getpass
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+MIN_PASSWORD_LENGTH = 8
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def make_prompt():
+    """Return an input()-like function; piped stdin is read in one go."""
+    if sys.stdin.isatty():
+        def prompt(text, secret=False):
+            # getpass reads the line with echo turned off
+            return getpass.getpass(text) if secret else input(text)
+
+        return prompt
+
+    answers = iter(sys.stdin.read().splitlines())
+
+    def prompt(text, secret=False):
+        print(text)
+        return next(answers, '')
+
+    return prompt
+
+
+def collect_user_details(prompt, username: str = None, email: str = None,
+                         password: str = None) -> Optional[Tuple[str, str, str]]:
+    """Prompt for any missing account details and validate them."""
+    if not username:
+        username = prompt("Enter username: ").strip()
+        if not username:
+            print("❌ Username cannot be empty!")
+            return None
+
+    if not email:
+        email = prompt("Enter email address: ").strip()
+        if not email:
+            print("❌ Email cannot be empty!")
+            return None
+
+    if not password:
+        password = prompt("Enter password: ", secret=True).strip()
+        if not password:
+            print("❌ Password cannot be empty!")
+            return None
+
+        # Confirm password
+        confirm_password = prompt("Confirm password: ", secret=True).strip()
+        if password != confirm_password:
+            print("❌ Passwords do not match!")
+            return None
+
+    if len(password) < MIN_PASSWORD_LENGTH:
+        print(f"❌ Password must be at least {MIN_PASSWORD_LENGTH} characters long!")
+        return None
+
+    return username, email, password
+
+
+def create_user(username: str, email: str, password: str, role: str = 'admin', app=None) -> bool:
+    """Create a login account, reusing ``app`` when the caller already has one."""
+    # Reject weak passwords before paying for app startup, queries and hashing
+    if len(password) < MIN_PASSWORD_LENGTH:
+        print(f"❌ Password must be at least {MIN_PASSWORD_LENGTH} characters long!")
+        return False
+
+    try:
+        from app import create_app
+        from app.extensions import db
+        from app.models import User, UserRole
+        from app.utils.passwords import hash_password
+        from sqlalchemy import or_
+
+        role = UserRole(role)
+
+        if app is None:
+            app = create_app()
+
+        with app.app_context():
+            # Check if the username or email is taken, in one query
+            # Fetch only the two columns, without building User objects
+            existing = db.session.query(User.username, User.email).filter(
+                or_(User.username == username, User.email == email)
+            ).all()
+            if any(row.username == username for row in existing):
+                print(f"User '{username}' already exists!")
+                return False
+
+            if existing:
+                print(f"Email '{email}' is already registered!")
+                return False
+
+            new_user = User(
+                username=username,
+                email=email,
+                password_hash=hash_password(password),
+                role=role,
+                is_active=True
+            )
+
+            db.session.add(new_user)
+            db.session.commit()
+
+            print("\n".join([
+                f"✅ Successfully created {role.value} user:",
+                f"   Username: {username}",
+                f"   Email: {email}",
+                f"   Role: {role.value}",
+                "   Status: Active",
+                "",
+                "You can now log in to the system using these credentials."
+            ]))
+
+            return True
+
+    except Exception as e:
+        print(f"❌ Error creating user: {e}")
+        return False
+
+
+def create_users_from_file(batch_file: str, role: str = 'admin') -> bool:
+    """Create users from a username,email,password CSV file in one transaction."""
+    try:
+        rows = []
+        with open(batch_file, newline='') as f:
+            for line_no, row in enumerate(csv.reader(f), 1):
+                if not row or row[0].startswith('#'):
+                    continue
+                if len(row) != 3:
+                    print(f"❌ Line {line_no}: expected username,email,password")
+                    return False
+                username, email, password = (field.strip() for field in row)
+                if len(password) < MIN_PASSWORD_LENGTH:
+                    print(f"❌ Line {line_no}: password for '{username}' must be at least "
+                          f"{MIN_PASSWORD_LENGTH} characters long!")
+                    return False
+                rows.append((username, email, password))
+
+        if not rows:
+            print(f"❌ No users found in {batch_file}")
+            return False
+
+        usernames = [row[0] for row in rows]
+        emails = [row[1] for row in rows]
+        if len(set(usernames)) != len(usernames) or len(set(emails)) != len(emails):
+            print("❌ Batch file contains duplicate usernames or emails!")
+            return False
+
+        from app import create_app
+        from app.extensions import db
+        from app.models import User, UserRole
+        from app.utils.passwords import hash_password
+        from sqlalchemy import or_
+
+        role = UserRole(role)
+
+        # argon2 releases the GIL while hashing, so larger batches hash in
+        # parallel; each hash holds ~46 MiB, so the pool is kept small
+        passwords = [row[2] for row in rows]
+        if len(passwords) > 4:
+            with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+                hashes = list(executor.map(hash_password, passwords))
+        else:
+            hashes = [hash_password(password) for password in passwords]
+
+        app = create_app()
+
+        with app.app_context():
+            existing = db.session.query(User.username, User.email).filter(
+                or_(User.username.in_(usernames), User.email.in_(emails))
+            ).all()
+            if existing:
+                for row in existing:
+                    print(f"User '{row.username}' <{row.email}> already exists!")
+                return False
+
+            # One executemany INSERT and a single commit for every user
+            db.session.execute(User.__table__.insert(), [
+                {
+                    'username': username,
+                    'email': email,
+                    'password_hash': password_hash,
+                    'role': role,
+                    'is_active': True
+                }
+                for (username, email, _), password_hash in zip(rows, hashes)
+            ])
+            db.session.commit()
+
+            print("\n".join(
+                [f"✅ Successfully created {len(rows)} {role.value} users:"]
+                + [f"   • {username}" for username in usernames]
+            ))
+
+            return True
+
+    except Exception as e:
+        print(f"❌ Error creating users: {e}")
+        return False
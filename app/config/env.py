@@ -0,0 +1,38 @@
+"""
+Environment Layers
+Load the .env files and system config the app reads its settings from.
+
+Kept free of Flask extension imports so scripts can resolve DB_TYPE and
+DB_* the same way the app does without building it.
+"""
+
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+SYSTEM_CONFIG = Path('/etc/postfix-manager') / 'app.conf'
+
+def load_env_layers(project_root=None):
+    """Load .env, .env.local, .env.<mode> plus system app.conf"""
+    project_root = Path(project_root or PROJECT_ROOT)
+    
+    # Base
+    load_dotenv(project_root / '.env')
+    
+    # Local overrides (gitignored)
+    load_dotenv(project_root / '.env.local')
+    
+    # Mode-specific
+    mode = os.environ.get('FLASK_ENV') or os.environ.get('ENV') or 'development'
+    load_dotenv(project_root / f'.env.{mode}')
+    
+    # VM-specific (for production deployments)
+    load_dotenv(project_root / '.env.vm')
+    
+    # Production system config (highest precedence)
+    try:
+        if SYSTEM_CONFIG.exists():
+            load_dotenv(SYSTEM_CONFIG, override=True)
+    except Exception:
+        pass
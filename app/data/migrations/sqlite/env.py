@@ -22,8 +22,9 @@ from app.models import *  # Import all models
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. Callers running alembic in-process
+# (scripts/migrate_all.py) turn this off to keep their own logging.
+if config.config_file_name is not None and config.attributes.get('configure_logger', True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -38,6 +39,11 @@ target_metadata = db.metadata
 
 def get_url():
     """Get database URL from Flask app configuration."""
+    # In-process callers pass the URL so the app isn't built once per run
+    url = config.attributes.get('database_url')
+    if url is not None:
+        return url
+    
     flask_app = create_app()
     with flask_app.app_context():
         return flask_app.config.get('SQLALCHEMY_DATABASE_URI')
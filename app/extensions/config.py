@@ -4,37 +4,12 @@ Handle application configuration and environment setup
 """
 
 import os
-from dotenv import load_dotenv
-from pathlib import Path
+from app.config.env import load_env_layers
 from .database import DbConfig
 
-def _load_env_layers():
-    """Load .env, .env.local, .env.<mode> plus system app.conf"""
-    project_root = Path(__file__).parent.parent.parent
-    
-    # Base
-    load_dotenv(project_root / '.env')
-    
-    # Local overrides (gitignored)
-    load_dotenv(project_root / '.env.local')
-    
-    # Mode-specific
-    mode = os.environ.get('FLASK_ENV') or os.environ.get('ENV') or 'development'
-    load_dotenv(project_root / f'.env.{mode}')
-    
-    # VM-specific (for production deployments)
-    load_dotenv(project_root / '.env.vm')
-    
-    # Production system config (highest precedence)
-    try:
-        if (Path('/etc/postfix-manager') / 'app.conf').exists():
-            load_dotenv('/etc/postfix-manager/app.conf', override=True)
-    except Exception:
-        pass
-
 def init_config(app):
     """Set up core Flask app configuration from environment variables."""
-    _load_env_layers()  # Load environment variables first
+    load_env_layers()  # Load environment variables first
     
     # Determine the environment
     env = os.environ.get('FLASK_ENV') or os.environ.get('ENV') or 'development'
@@ -57,7 +32,14 @@ def init_config(app):
     
     # Database-specific engine options
     db_type = db_config.db_type
-    if db_type == 'sqlite':
+    if os.getenv('DB_NULL_POOL', 'False').lower() == 'true':
+        # One-shot scripts use a single connection, so skip pooling and pre-ping
+        from sqlalchemy.pool import NullPool
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'echo': os.getenv('SQLALCHEMY_ECHO', 'false').lower() == 'true',
+            'poolclass': NullPool
+        }
+    elif db_type == 'sqlite':
         # SQLite doesn't support connection pooling
         app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
             'echo': os.getenv('SQLALCHEMY_ECHO', 'false').lower() == 'true',
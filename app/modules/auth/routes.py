@@ -8,7 +8,8 @@ from urllib.parse import urlparse
 from app.modules.auth import bp
 from app.modules.auth.forms import LoginForm, ChangePasswordForm
 from app.models import User, AuditLog
-from app.extensions import db, bcrypt
+from app.extensions import db
+from app.utils.passwords import hash_password, check_password, needs_rehash
 from datetime import datetime
 
 
@@ -20,9 +21,12 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and bcrypt.check_password_hash(user.password_hash, form.password.data):
+        if user and check_password(user.password_hash, form.password.data):
             login_user(user, remember=form.remember_me.data)
             user.last_login = datetime.utcnow()
+            # Upgrade bcrypt hashes to Argon2id while we have the plaintext
+            if needs_rehash(user.password_hash):
+                user.password_hash = hash_password(form.password.data)
             db.session.commit()
             
             # Log the login
@@ -69,8 +73,8 @@ def logout():
 def change_password():
     form = ChangePasswordForm()
     if form.validate_on_submit():
-        if bcrypt.check_password_hash(current_user.password_hash, form.current_password.data):
-            current_user.password_hash = bcrypt.generate_password_hash(form.new_password.data).decode('utf-8')
+        if check_password(current_user.password_hash, form.current_password.data):
+            current_user.password_hash = hash_password(form.new_password.data)
             db.session.commit()
             
             # Log the password change
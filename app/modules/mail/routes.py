@@ -202,6 +202,11 @@ def postfix_queue():
         
         # Get detailed queue information
         queue_info = postfix_manager.get_detailed_queue_info(queue_type, limit)
+        if 'error' in queue_info:
+            return jsonify({
+                'success': False,
+                'message': queue_info['error']
+            }), 500
         
         return jsonify({
             'success': True,
@@ -246,6 +251,10 @@ def postfix_add_domain():
         postfix_manager = PostfixManager()
         success = postfix_manager.add_domain(domain)
         
+        # Reload now rather than after the debounce so the response
+        # reflects whether Postfix actually picked up the change
+        reloaded = success and postfix_manager.flush_pending()
+        
         if success:
             # Log the action
             try:
@@ -264,6 +273,12 @@ def postfix_add_domain():
                 logger.error(f"Failed to create audit log: {db_error}")
                 # Don't fail the operation if audit logging fails
             
+            if not reloaded:
+                return jsonify({
+                    'success': False,
+                    'message': f'Domain {domain} added to Postfix, but reloading Postfix failed'
+                }), 500
+            
             return jsonify({
                 'success': True,
                 'message': f'Domain {domain} added to Postfix successfully'
@@ -307,6 +322,10 @@ def postfix_remove_domain():
         postfix_manager = PostfixManager()
         success = postfix_manager.remove_domain(domain)
         
+        # Reload now rather than after the debounce so the response
+        # reflects whether Postfix actually picked up the change
+        reloaded = success and postfix_manager.flush_pending()
+        
         if success:
             # Log the action
             try:
@@ -325,6 +344,12 @@ def postfix_remove_domain():
                 logger.error(f"Failed to create audit log: {db_error}")
                 # Don't fail the operation if audit logging fails
             
+            if not reloaded:
+                return jsonify({
+                    'success': False,
+                    'message': f'Domain {domain} removed from Postfix, but reloading Postfix failed'
+                }), 500
+            
             return jsonify({
                 'success': True,
                 'message': f'Domain {domain} removed from Postfix successfully'
@@ -523,12 +548,11 @@ def mail_statistics():
         postfix_manager = PostfixManager()
         dovecot_manager = DovecotManager()
         
-        # Get basic service status
-        postfix_status = postfix_manager.get_status()
-        dovecot_status = postfix_manager.get_dovecot_status()
-        
-        # Get queue information
-        queue_info = postfix_manager.get_queue_info()
+        # Get service status and queue information in one concurrent batch
+        status = PostfixManager.get_all_status()
+        postfix_status = status['postfix']
+        dovecot_status = status['dovecot']
+        queue_info = status['queue']
         
         # Get domain information
         domains = postfix_manager.get_virtual_domains()
@@ -861,8 +885,16 @@ def postfix_queue_flush():
         data = request.get_json() or {}
         queue_type = data.get('queue_type', 'all')
         
+        if queue_type not in ('all', 'deferred', 'hold'):
+            return jsonify({
+                'success': False,
+                'message': f'Invalid queue type: {queue_type}'
+            }), 400
+        
+        # Flushing can take up to a minute; run it in the background and
+        # let the client poll /postfix/jobs/<job_id> for the outcome
         postfix_manager = PostfixManager()
-        result = postfix_manager.flush_queue(queue_type)
+        result = postfix_manager.start_job('flush_queue', queue_type)
         
         if result.get('success'):
             # Log the action
@@ -872,7 +904,7 @@ def postfix_queue_flush():
                     action='flush_queue',
                     resource_type='postfix_queue',
                     resource_id=queue_type,
-                    details=f'Flushed {queue_type} queue',
+                    details=f'Started flush of {queue_type} queue (job {result["job_id"]})',
                     ip_address=request.remote_addr
                 )
                 db.session.add(audit_log)
@@ -882,8 +914,9 @@ def postfix_queue_flush():
             
             return jsonify({
                 'success': True,
-                'message': result['message']
-            })
+                'message': f'Flush of {queue_type} queue started',
+                'job_id': result['job_id']
+            }), 202
         else:
             return jsonify({
                 'success': False,
@@ -898,6 +931,31 @@ def postfix_queue_flush():
         }), 500
 
 
+@bp.route('/postfix/jobs/<job_id>')
+@login_required
+def postfix_job_status(job_id):
+    """Get the status of a background queue job."""
+    try:
+        job = PostfixManager.get_job_status(job_id)
+        
+        if 'error' in job:
+            return jsonify({
+                'success': False,
+                'message': job['error']
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        })
+    except Exception as e:
+        logger.error(f"Error getting job status: {e}")
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+
 @bp.route('/postfix/queue/delete', methods=['POST'])
 @login_required
 def postfix_queue_delete():
@@ -24,9 +24,10 @@ def index():
     
     # Get system status
     try:
-        postfix_status = PostfixManager.get_status()
-        dovecot_status = PostfixManager.get_dovecot_status()
-        ldap_status = LDAPManager.get_status()
+        status = PostfixManager.get_all_status(queue=False, ldap=LDAPManager.get_status)
+        postfix_status = status['postfix']
+        dovecot_status = status['dovecot']
+        ldap_status = status['ldap']
     except Exception as e:
         postfix_status = {'status': 'error', 'message': str(e)}
         dovecot_status = {'status': 'error', 'message': str(e)}
@@ -201,9 +202,10 @@ def status():
     
     # Get comprehensive system status
     try:
-        postfix_status = PostfixManager.get_status()
-        dovecot_status = PostfixManager.get_dovecot_status()
-        ldap_status = LDAPManager.get_status()
+        status = PostfixManager.get_all_status(queue=False, ldap=LDAPManager.get_status)
+        postfix_status = status['postfix']
+        dovecot_status = status['dovecot']
+        ldap_status = status['ldap']
         
         # Additional system checks could be added here
         system_status = {
@@ -231,9 +233,10 @@ def status():
 def api_status():
     """API endpoint for system status."""
     try:
-        postfix_status = PostfixManager.get_status()
-        dovecot_status = PostfixManager.get_dovecot_status()
-        ldap_status = LDAPManager.get_status()
+        status = PostfixManager.get_all_status(queue=False, ldap=LDAPManager.get_status)
+        postfix_status = status['postfix']
+        dovecot_status = status['dovecot']
+        ldap_status = status['ldap']
         
         return jsonify({
             'success': True,
@@ -3,15 +3,678 @@ Postfix and Dovecot Management Utility
 """
 
 import os
+import json
+import math
+import mmap
 import subprocess
 import shutil
 import re
+import select
+import selectors
+import signal
+import tarfile
+import tempfile
 import time
-from typing import Dict, List, Optional
+import functools
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 import logging
 
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+try:
+    from pystemd.dbuslib import DBus
+    from pystemd.systemd1 import Unit as SystemdUnit
+except ImportError:
+    DBus = None
+    SystemdUnit = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# main.cf path -> (st_mtime, virtual_domains already configured)
+_main_cf_state: Dict[str, Tuple[float, bool]] = {}
+
+# virtual_domains path -> ((st_mtime_ns, st_size), domains in file order). The
+# dict is used as an ordered set; it is reloaded whenever either changes.
+_domains_lock = threading.Lock()
+_domains_state: Dict[str, Tuple[Tuple[int, int], Dict[str, None]]] = {}
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    """Return (st_mtime_ns, st_size), which changes whenever the file does."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+# Queue info is kept in the probe cache under 'queue'. With an inotify watch
+# on the spool it is reused until queue files change (or QUEUE_CACHE_MAX_AGE);
+# without one it expires after QUEUE_CACHE_TTL. Queue-mutating methods drop
+# it explicitly via PostfixManager.invalidate().
+QUEUE_SPOOL_DIR = "/var/spool/postfix"
+# Every spool directory that holds queued messages; the counts, sizes and
+# watches below all use this one list so they agree with each other
+QUEUE_DIRS = ('maildrop', 'incoming', 'active', 'deferred', 'hold')
+QUEUE_CACHE_TTL = 30
+QUEUE_CACHE_MAX_AGE = 300
+QUEUE_PREVIEW_MESSAGES = 100
+
+_queue_watcher_lock = threading.Lock()
+_queue_refresh_lock = threading.Lock()
+# Bumped on every spool change, so a result collected across a change isn't cached
+_queue_generation = 0
+_queue_watcher = None
+
+
+def _mark_queue_dirty(event=None):
+    """Drop the cached queue info (inotify callback)."""
+    global _queue_generation
+    _queue_generation += 1
+    _probe_cache.pop('queue')
+
+
+def _start_queue_watcher() -> bool:
+    """Start watching the Postfix spool for queue changes, if possible."""
+    global _queue_watcher
+    if _queue_watcher is not None:
+        return bool(_queue_watcher)
+    if pyinotify is None:
+        return False
+    
+    with _queue_watcher_lock:
+        if _queue_watcher is not None:
+            return bool(_queue_watcher)
+        try:
+            wm = pyinotify.WatchManager()
+            mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                    pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM)
+            watched = False
+            for name in QUEUE_DIRS:
+                wdd = wm.add_watch(os.path.join(QUEUE_SPOOL_DIR, name), mask,
+                                   rec=True, auto_add=True)
+                watched = watched or any(wd > 0 for wd in wdd.values())
+            if not watched:
+                # Usually a permissions problem on the spool; use the TTL
+                _queue_watcher = False
+                return False
+            
+            notifier = pyinotify.ThreadedNotifier(wm, default_proc_fun=_mark_queue_dirty)
+            notifier.daemon = True
+            notifier.start()
+            _queue_watcher = notifier
+        except Exception as e:
+            logger.warning(f"Queue watcher unavailable, using TTL cache: {e}")
+            _queue_watcher = False
+    
+    return bool(_queue_watcher)
+
+
+def _walk_spool(roots: Optional[List[str]] = None):
+    """Yield the os.DirEntry of every message file under roots.
+    
+    roots defaults to the QUEUE_DIRS of the Postfix spool. deferred/ and
+    hold/ are hashed into subdirectories, so the walk descends into them;
+    each directory is listed once with os.scandir. Raises OSError when a
+    directory can't be read (usually permissions).
+    """
+    stack = list(roots) if roots is not None else [
+        os.path.join(QUEUE_SPOOL_DIR, name) for name in QUEUE_DIRS]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    yield entry
+
+
+def _spool_is_empty() -> Optional[bool]:
+    """Check the queue directories for any message file without forking.
+    
+    Returns None when the spool can't be read (usually permissions), in
+    which case callers should fall back to postqueue.
+    """
+    try:
+        with closing(_walk_spool()) as files:
+            for _ in files:
+                return False
+        return True
+    except OSError:
+        return None
+
+
+def _scan_spool(*roots: str) -> Tuple[int, float, float]:
+    """Return total size and oldest/newest file age (seconds) under roots.
+    
+    roots defaults to the QUEUE_DIRS of the Postfix spool. Each file is
+    stat()ed once; ages are 0 when there are no files.
+    """
+    now = time.time()
+    total = 0
+    oldest = 0.0
+    newest = math.inf
+    for entry in _walk_spool(list(roots) if roots else None):
+        st = entry.stat(follow_symlinks=False)
+        total += st.st_size
+        age = now - st.st_mtime
+        if age > oldest:
+            oldest = age
+        if age < newest:
+            newest = age
+    return total, oldest, (0.0 if newest == math.inf else newest)
+
+
+# Shown as the queue details when postqueue lists no messages
+_QUEUE_EMPTY_NOTICE = 'Mail queue is empty'
+
+# postqueue command per flushable queue
+_FLUSH_COMMANDS = {
+    'all': ('postqueue', '-f'),
+    'deferred': ('postqueue', '-f', 'deferred'),
+    'hold': ('postqueue', '-f', 'hold')
+}
+
+# Files under the Postfix config dir included in backup_config archives
+POSTFIX_BACKUP_FILES = (
+    "main.cf",
+    "master.cf",
+    "aliases",
+    "canonical",
+    "relocated",
+    "transport",
+    "virtual",
+    "virtual_alias_domains"
+)
+
+# IMAP, IMAPS, POP3 and POP3S listening ports counted as Dovecot connections
+MAIL_CLIENT_PORTS = frozenset((143, 993, 110, 995))
+_PROC_NET_TCP = ('/proc/net/tcp', '/proc/net/tcp6')
+# /proc/net/tcp prints ports as 4 upper-case hex digits and state 01 for
+# ESTABLISHED; comparing the raw bytes avoids decoding or int() per socket
+_MAIL_PORTS_HEX = frozenset(b'%04X' % port for port in MAIL_CLIENT_PORTS)
+_TCP_ESTABLISHED = b'01'
+
+
+def _count_mail_connections() -> int:
+    """Count established connections to the mail ports from /proc/net/tcp*."""
+    count = 0
+    found = False
+    for path in _PROC_NET_TCP:
+        try:
+            with open(path, 'rb') as f:
+                found = True
+                next(f)  # header
+                for line in f:
+                    # sl local_address rem_address st ...
+                    fields = line.split(None, 4)
+                    if fields[3] == _TCP_ESTABLISHED and fields[1][-4:] in _MAIL_PORTS_HEX:
+                        count += 1
+        except (FileNotFoundError, StopIteration):
+            # No IPv6 on this host
+            continue
+    
+    if not found:
+        # No procfs (e.g. not Linux); fall back to netstat
+        result = subprocess.run(['netstat', '-an'], capture_output=True, text=True, timeout=10)
+        count = sum(1 for line in result.stdout.splitlines()
+                    if 'ESTABLISHED' in line and
+                    any(f':{port} ' in line for port in MAIL_CLIENT_PORTS))
+    return count
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+    
+    This is the one expiring cache in this module; ``set`` can give an entry
+    its own TTL when keys need different lifetimes.
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return item[1]
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Short-lived results of read-only status probes and the queue info, keyed
+# on 'postfix_status', 'dovecot_status', 'protocol_status' and 'queue'
+STATUS_CACHE_TTL = 5
+PROTOCOL_CACHE_TTL = 300
+_probe_cache = _TTLCache(maxsize=32, ttl=STATUS_CACHE_TTL)
+# One refresh lock per key, so concurrent misses run the probe only once
+_probe_refresh_locks_lock = threading.Lock()
+_probe_refresh_locks: Dict[str, threading.Lock] = {}
+_MISSING = object()
+
+
+def ttl_cached(key: str, seconds: float):
+    """Memoize a read-only probe for ``seconds``, shared by all instances.
+    
+    When the entry has expired, the first caller refreshes it and any
+    concurrent callers wait for that result instead of probing as well.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            value = _probe_cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            
+            with _probe_refresh_locks_lock:
+                refresh_lock = _probe_refresh_locks.setdefault(key, threading.Lock())
+            with refresh_lock:
+                value = _probe_cache.get(key, _MISSING)
+                if value is _MISSING:
+                    value = func(*args, **kwargs)
+                    _probe_cache.set(key, value, seconds)
+            return value
+        return wrapper
+    return decorator
+
+
+# A virtual_alias_domains parameter in main.cf, with any indented continuation
+# lines as its value. Older releases wrote a non-standard
+# 'virtual_domains = hash:...' line, which must not count.
+_VIRTUAL_ALIAS_DOMAINS_LINE = re.compile(
+    rb'^virtual_alias_domains[ \t]*=(.*(?:\n[ \t]+.*)*)', re.MULTILINE)
+
+# Debounced reload after virtual domain changes, keyed on config_dir
+RELOAD_DEBOUNCE_SECONDS = 0.5
+_pending_reloads_lock = threading.Lock()
+_pending_reloads: Dict[str, threading.Timer] = {}
+
+# Per-user Dovecot lookups, keyed on (username, domain)
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 30
+_user_info_cache = _TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+_user_quota_cache = _TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+# Open dovecot-quota files: path -> (fd, (st_dev, st_ino)). Dovecot replaces
+# the file on update, so the inode is checked and a stale fd reopened.
+QUOTA_FD_CACHE_SIZE = 256
+_quota_fds_lock = threading.Lock()
+_quota_fds: "OrderedDict[str, Tuple[int, Tuple[int, int]]]" = OrderedDict()
+
+
+def _read_quota_file(path: str) -> int:
+    """Read the integer in a quota file through a cached file descriptor."""
+    st = os.stat(path)
+    identity = (st.st_dev, st.st_ino)
+    with _quota_fds_lock:
+        entry = _quota_fds.get(path)
+        if entry is not None and entry[1] == identity:
+            fd = entry[0]
+            _quota_fds.move_to_end(path)
+        else:
+            if entry is not None:
+                os.close(entry[0])
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            _quota_fds[path] = (fd, identity)
+            while len(_quota_fds) > QUOTA_FD_CACHE_SIZE:
+                os.close(_quota_fds.popitem(last=False)[1][0])
+        buf = os.pread(fd, 32, 0)
+    return int(buf.strip() or 0)
+
+
+# Thread pools, created on first use so importing this module (from a CLI
+# script or a test) starts no threads:
+# - 'mailprobe' fans out read-only status probes, so a page that needs
+#   several of them waits for the slowest rather than for their sum
+# - 'mail-job' runs slow queue maintenance, so requests return with a job
+#   id instead of blocking a worker on postsuper/postqueue
+PROBE_WORKERS = 4
+JOB_WORKERS = 4
+_executors_lock = threading.Lock()
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def _executor(name: str, workers: int) -> ThreadPoolExecutor:
+    """Return the named thread pool, creating it on first use."""
+    with _executors_lock:
+        pool = _executors.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            _executors[name] = pool
+        return pool
+
+
+JOB_HISTORY = 100
+_jobs_lock = threading.Lock()
+_jobs: "OrderedDict[str, Tuple[str, Future]]" = OrderedDict()
+
+
+def _submit_job(operation: str, func: Callable, *args) -> str:
+    """Run func in the job pool and return the id to poll it by."""
+    job_id = uuid.uuid4().hex
+    future = _executor('mail-job', JOB_WORKERS).submit(func, *args)
+    with _jobs_lock:
+        _jobs[job_id] = (operation, future)
+        # Forget the oldest finished jobs once the history is full
+        for old_id in list(_jobs):
+            if len(_jobs) <= JOB_HISTORY:
+                break
+            if _jobs[old_id][1].done():
+                del _jobs[old_id]
+    return job_id
+
+
+SERVICE_POLL_INTERVAL = 0.1
+
+
+def _run_service_command(cmd: List[str], timeout: int,
+                         progress: Optional[Callable[[float], None]] = None) -> bool:
+    """Run a service control command and report whether it succeeded.
+    
+    Without a progress callback this simply blocks until the command
+    exits. With one, the command is polled every SERVICE_POLL_INTERVAL
+    seconds and the callback receives the elapsed time, so the caller can
+    show feedback while a slow restart is in progress.
+    """
+    if progress is None:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+        return result.returncode == 0
+    
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.monotonic()
+    try:
+        while True:
+            try:
+                return proc.wait(timeout=SERVICE_POLL_INTERVAL) == 0
+            except subprocess.TimeoutExpired:
+                elapsed = time.monotonic() - started
+                if elapsed >= timeout:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                progress(elapsed)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def _spawn_capture(argv: List[str], timeout: float) -> Tuple[int, bytes, bytes]:
+    """Run a short read-only command and return (returncode, stdout, stderr).
+    
+    Uses os.posix_spawnp with one pipe each for stdout and stderr, skipping
+    Popen's fork/exec bookkeeping. The pipes are waited on with a selector
+    rather than select.select, which can't take fds above 1024 in a busy
+    server. Falls back to subprocess.run where posix_spawn isn't available.
+    """
+    if not hasattr(os, 'posix_spawnp'):
+        result = subprocess.run(argv, capture_output=True, timeout=timeout)
+        return result.returncode, result.stdout, result.stderr
+    
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
+    try:
+        pid = os.posix_spawnp(argv[0], argv, os.environ, file_actions=[
+            (os.POSIX_SPAWN_DUP2, out_write, 1),
+            (os.POSIX_SPAWN_DUP2, err_write, 2)
+        ])
+    except BaseException:
+        os.close(out_read)
+        os.close(err_read)
+        raise
+    finally:
+        os.close(out_write)
+        os.close(err_write)
+    
+    chunks = {out_read: [], err_read: []}
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        try:
+            for fd in chunks:
+                selector.register(fd, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                events = selector.select(remaining) if remaining > 0 else []
+                if not events:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                    raise subprocess.TimeoutExpired(argv, timeout)
+                for key, _ in events:
+                    chunk = os.read(key.fd, 4096)
+                    if chunk:
+                        chunks[key.fd].append(chunk)
+                    else:
+                        selector.unregister(key.fd)
+        finally:
+            os.close(out_read)
+            os.close(err_read)
+    
+    _, status = os.waitpid(pid, 0)
+    returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return returncode, b''.join(chunks[out_read]), b''.join(chunks[err_read])
+
+
+# Loaded pystemd units, keyed on service name. Talking to systemd over
+# D-Bus avoids forking systemctl; without pystemd (or without a system bus)
+# the systemctl commands are used instead.
+_systemd_units_lock = threading.Lock()
+_systemd_units: Dict[str, Any] = {}
+
+
+def _systemd_unit(service: str) -> Optional[Any]:
+    """Return the loaded pystemd unit for a service, or None if unavailable."""
+    if SystemdUnit is None:
+        return None
+    with _systemd_units_lock:
+        unit = _systemd_units.get(service)
+        if unit is None:
+            try:
+                unit = SystemdUnit(f"{service}.service".encode())
+                unit.load()
+            except Exception as e:
+                logger.debug(f"systemd D-Bus unavailable for {service}: {e}")
+                return None
+            _systemd_units[service] = unit
+        return unit
+
+
+def _service_state(service: str) -> str:
+    """Return the service's systemd ActiveState, e.g. 'active' or 'failed'."""
+    unit = _systemd_unit(service)
+    if unit is not None:
+        try:
+            return unit.Unit.ActiveState.decode()
+        except Exception as e:
+            logger.debug(f"D-Bus ActiveState query for {service} failed: {e}")
+    
+    _, stdout, _ = _spawn_capture(['systemctl', 'is-active', service], timeout=10)
+    # is-active prints a single short word; skip decoding the rest
+    return stdout[:16].decode('ascii', 'replace').strip()
+
+
+# Probe cache keys refreshed when a service's ActiveState changes
+_SERVICE_STATUS_KEYS = {
+    'postfix': ('postfix_status',),
+    'dovecot': ('dovecot_status', 'protocol_status')
+}
+_status_watcher = None
+STATUS_WATCH_RETRY = 30
+
+
+def _drop_cached_status(keys):
+    """Drop cached probe results so the next read refreshes them."""
+    for key in keys:
+        _probe_cache.pop(key)
+
+
+def _on_properties_changed(msg, error=None, userdata=None):
+    """Drop a service's cached status when systemd reports a state change."""
+    msg.process_reply(True)
+    _interface, changed, _invalidated = msg.body
+    if b'ActiveState' in changed or 'ActiveState' in changed:
+        _drop_cached_status(userdata)
+
+
+def _watch_service_states(units: Dict[str, Any]):
+    """Dispatch PropertiesChanged signals for the given units forever.
+    
+    If the bus connection fails, the cached states are dropped (changes may
+    have been missed) and the watch is re-armed after STATUS_WATCH_RETRY
+    seconds; the TTL covers the gap.
+    """
+    while True:
+        try:
+            with DBus() as bus:
+                for service, unit in units.items():
+                    bus.match_signal(unit.destination, unit.path,
+                                     b'org.freedesktop.DBus.Properties', b'PropertiesChanged',
+                                     _on_properties_changed, _SERVICE_STATUS_KEYS[service])
+                # poll() has no FD_SETSIZE limit, unlike select()
+                poller = select.poll()
+                poller.register(bus.get_fd(), select.POLLIN)
+                while True:
+                    poller.poll()
+                    bus.process()
+        except Exception as e:
+            logger.warning(f"systemd status watcher failed, retrying in {STATUS_WATCH_RETRY}s: {e}")
+        
+        for keys in _SERVICE_STATUS_KEYS.values():
+            _drop_cached_status(keys)
+        time.sleep(STATUS_WATCH_RETRY)
+
+
+def _start_status_watcher() -> bool:
+    """Start invalidating status probes on systemd state changes, if possible."""
+    global _status_watcher
+    if _status_watcher is not None:
+        return bool(_status_watcher)
+    if DBus is None:
+        return False
+    
+    with _systemd_units_lock:
+        if _status_watcher is not None:
+            return bool(_status_watcher)
+        _status_watcher = False
+    
+    units = {}
+    for service in _SERVICE_STATUS_KEYS:
+        unit = _systemd_unit(service)
+        if unit is not None:
+            units[service] = unit
+    if not units:
+        return False
+    
+    thread = threading.Thread(target=_watch_service_states, args=(units,),
+                              name='systemd-status-watcher', daemon=True)
+    thread.start()
+    _status_watcher = thread
+    return True
+
+
+def _control_service(action: str, service: str, timeout: int,
+                     progress: Optional[Callable[[float], None]] = None) -> bool:
+    """Restart or reload a service and wait for it to settle.
+    
+    Over D-Bus the job is queued with mode 'replace' and polled until systemd
+    removes it; the unit must then be 'active' and, for a restart, running
+    under a new InvocationID. 'failed' or 'inactive' count as failure.
+    """
+    unit = _systemd_unit(service)
+    if unit is None:
+        return _run_service_command(['systemctl', action, service], timeout=timeout, progress=progress)
+    
+    method = unit.Unit.Restart if action == 'restart' else unit.Unit.Reload
+    previous_invocation = unit.Unit.InvocationID
+    job = method(b'replace')
+    started = time.monotonic()
+    while True:
+        time.sleep(SERVICE_POLL_INTERVAL)
+        # The unit stays 'active' until a queued job actually runs, so the
+        # state only means something once our job is gone
+        if unit.Unit.Job[1] != job:
+            state = unit.Unit.ActiveState
+            if state in (b'failed', b'inactive'):
+                return False
+            if state == b'active':
+                return action != 'restart' or unit.Unit.InvocationID != previous_invocation
+        elapsed = time.monotonic() - started
+        if elapsed >= timeout:
+            raise subprocess.TimeoutExpired(['systemctl', action, service], timeout)
+        if progress is not None:
+            progress(elapsed)
+
+
+class _StreamedCommand:
+    """A running command whose stdout is read as it arrives.
+    
+    stderr is spooled to an unlinked temp file rather than a pipe, so a
+    chatty child can't fill a pipe nobody reads and stall until killed.
+    """
+    
+    def __init__(self, proc: subprocess.Popen, stderr_file):
+        self.proc = proc
+        self.stdout = proc.stdout
+        self._stderr_file = stderr_file
+    
+    def finish(self) -> Tuple[int, str]:
+        """Wait for the command to exit and return (returncode, stderr)."""
+        returncode = self.proc.wait()
+        self._stderr_file.seek(0)
+        return returncode, self._stderr_file.read()
+
+
+@contextmanager
+def _stream_command(cmd: List[str], timeout: int):
+    """Run a command with its stdout available for line-by-line reading.
+    
+    The process is killed if it outlives the timeout, and reaped on exit
+    even when the caller stops reading early.
+    """
+    with tempfile.TemporaryFile('w+', errors='replace') as stderr_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield _StreamedCommand(proc, stderr_file)
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
 
 class PostfixManager:
     """Manages Postfix mail server configuration and operations."""
@@ -20,29 +683,48 @@ class PostfixManager:
         self.config_dir = config_dir
         self.main_cf = os.path.join(config_dir, "main.cf")
         self.master_cf = os.path.join(config_dir, "master.cf")
+        self.virtual_domains_file = os.path.join(config_dir, "virtual_domains")
+        self._in_batch = False
+        self._reload_pending = False
+    
+    @staticmethod
+    def invalidate(key: Optional[str] = None):
+        """Drop cached probe results so the next read refreshes them.
+        
+        ``key`` is one of 'postfix_status', 'dovecot_status',
+        'protocol_status' or 'queue'; None clears everything.
+        """
+        if key is None:
+            _probe_cache.clear()
+            return
+        _probe_cache.pop(key)
+        if key == 'queue':
+            # get_status reports the queue count as well
+            _probe_cache.pop('postfix_status')
     
     @staticmethod
+    @ttl_cached('postfix_status', STATUS_CACHE_TTL)
     def get_status() -> Dict:
         """Get Postfix service status."""
         try:
-            result = subprocess.run(['systemctl', 'is-active', 'postfix'], 
-                                  capture_output=True, text=True, timeout=10)
-            status = result.stdout.strip()
+            _start_status_watcher()
+            status = _service_state('postfix')
             
             if status == 'active':
-                # Get additional info
+                # Get additional info; an idle host needs no postqueue run,
+                # and a busy one shares get_queue_info's cached result
                 try:
-                    queue_info = subprocess.run(['postqueue', '-p'], 
-                                              capture_output=True, text=True, timeout=10)
-                    queue_count = len([line for line in queue_info.stdout.split('\n') 
-                                     if line.startswith('Mail queue is empty') == False and line.strip()])
+                    if _spool_is_empty():
+                        queue_count = 0
+                    else:
+                        queue_count = PostfixManager().get_queue_info().get('count', 0)
                 except:
                     queue_count = 0
                 
                 return {
                     'status': 'running',
                     'service': 'active',
-                    'queue_count': max(0, queue_count - 1)  # Subtract header line
+                    'queue_count': queue_count
                 }
             else:
                 return {
@@ -58,21 +740,17 @@ class PostfixManager:
             }
     
     @staticmethod
+    @ttl_cached('dovecot_status', STATUS_CACHE_TTL)
     def get_dovecot_status() -> Dict:
         """Get Dovecot service status."""
         try:
-            result = subprocess.run(['systemctl', 'is-active', 'dovecot'], 
-                                  capture_output=True, text=True, timeout=10)
-            status = result.stdout.strip()
+            _start_status_watcher()
+            status = _service_state('dovecot')
             
             if status == 'active':
                 # Try to get connection count
                 try:
-                    # Use netstat to count connections on IMAP/POP3 ports
-                    imap_result = subprocess.run(['netstat', '-an'], 
-                                               capture_output=True, text=True, timeout=10)
-                    imap_connections = len([line for line in imap_result.stdout.split('\n') 
-                                          if ':143 ' in line or ':993 ' in line or ':110 ' in line or ':995 ' in line])
+                    imap_connections = _count_mail_connections()
                     
                     return {
                         'status': 'running',
@@ -98,22 +776,22 @@ class PostfixManager:
                 'message': str(e)
             }
     
-    def restart_service(self) -> bool:
+    def restart_service(self, progress: Optional[Callable[[float], None]] = None) -> bool:
         """Restart Postfix service."""
         try:
-            result = subprocess.run(['systemctl', 'restart', 'postfix'], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
+            success = _control_service('restart', 'postfix', timeout=30, progress=progress)
+            self.invalidate('postfix_status')
+            return success
         except Exception as e:
             logger.error(f"Error restarting Postfix: {e}")
             return False
     
-    def reload_config(self) -> bool:
+    def reload_config(self, progress: Optional[Callable[[float], None]] = None) -> bool:
         """Reload Postfix configuration."""
         try:
-            result = subprocess.run(['postfix', 'reload'], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
+            success = _run_service_command(['postfix', 'reload'], timeout=30, progress=progress)
+            self.invalidate('postfix_status')
+            return success
         except Exception as e:
             logger.error(f"Error reloading Postfix config: {e}")
             return False
@@ -122,108 +800,207 @@ class PostfixManager:
         """Check Postfix configuration syntax."""
         try:
             result = subprocess.run(['postfix', 'check'], 
-                                  capture_output=True, text=True, timeout=30)
+                                  capture_output=True, timeout=30)
             if result.returncode == 0:
                 return {'valid': True, 'message': 'Configuration is valid'}
             else:
-                return {'valid': False, 'message': result.stderr}
+                return {'valid': False, 'message': result.stderr.decode('utf-8', 'replace')}
         except Exception as e:
             logger.error(f"Error checking Postfix config: {e}")
             return {'valid': False, 'message': str(e)}
     
-    def get_queue_info(self) -> Dict:
-        """Get mail queue information."""
+    @classmethod
+    def check_all_configs(cls) -> Dict:
+        """Check Postfix and Dovecot configuration concurrently."""
+        pool = _executor('mailprobe', PROBE_WORKERS)
+        postfix = pool.submit(cls().check_config)
+        dovecot = pool.submit(DovecotManager().check_config)
+        results = {
+            'postfix': postfix.result(),
+            'dovecot': dovecot.result()
+        }
+        results['valid'] = all(r.get('valid', False) for r in results.values())
+        return results
+    
+    @classmethod
+    def get_all_status(cls, queue: bool = True, **extra_probes: Callable[[], Any]) -> Dict:
+        """Run the Postfix, Dovecot and (optionally) queue probes concurrently.
+        
+        Further probes, e.g. ``ldap=LDAPManager.get_status``, are run in the
+        same batch and returned under their keyword.
+        """
+        probes = {'postfix': cls.get_status, 'dovecot': cls.get_dovecot_status}
+        if queue:
+            probes['queue'] = cls().get_queue_info
+        probes.update(extra_probes)
+        
+        pool = _executor('mailprobe', PROBE_WORKERS)
+        futures = {key: pool.submit(probe) for key, probe in probes.items()}
+        return {key: future.result() for key, future in futures.items()}
+    
+    def snapshot(self) -> Dict:
+        """Collect service, protocol and queue status concurrently."""
+        return self.get_all_status(protocols=DovecotManager().get_protocol_status)
+    
+    # Queue operations that may be run as background jobs
+    JOB_OPERATIONS = ('rebuild_queue_index', 'flush_queue', 'flush_deferred_queue',
+                      'cleanup_expired_messages')
+    
+    def start_job(self, operation: str, *args) -> Dict:
+        """Start a queue operation in the background and return its job id."""
+        if operation not in self.JOB_OPERATIONS:
+            return {'error': f'Invalid job operation: {operation}'}
         try:
-            result = subprocess.run(['postqueue', '-p'], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                queue_count = len([line for line in lines 
-                                 if line.startswith('Mail queue is empty') == False and line.strip()])
-                
-                # Calculate queue size and age
-                queue_size = 0
-                oldest_age = 0
-                newest_age = 0
-                
+            job_id = _submit_job(operation, getattr(self, operation), *args)
+            return {'success': True, 'job_id': job_id, 'operation': operation}
+        except Exception as e:
+            logger.error(f"Error starting job {operation}: {e}")
+            return {'error': str(e)}
+    
+    @staticmethod
+    def get_job_status(job_id: str) -> Dict:
+        """Get the state, and once finished the result, of a background job."""
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+        if job is None:
+            return {'error': f'Unknown job: {job_id}'}
+        
+        operation, future = job
+        status = {'job_id': job_id, 'operation': operation}
+        if future.running():
+            status['status'] = 'running'
+        elif not future.done():
+            status['status'] = 'pending'
+        elif future.exception() is not None:
+            status['status'] = 'failed'
+            status['error'] = str(future.exception())
+        else:
+            status['status'] = 'done'
+            status['result'] = future.result()
+        return status
+    
+    def get_queue_info(self) -> Dict:
+        """Get mail queue information, served from cache while unchanged."""
+        info = _probe_cache.get('queue')
+        if info is not None:
+            return info
+        
+        watched = _start_queue_watcher()
+        
+        # Only one caller runs postqueue; the rest wait and reuse its result
+        with _queue_refresh_lock:
+            info = _probe_cache.get('queue')
+            if info is not None:
+                return info
+            
+            generation = _queue_generation
+            info = self._collect_queue_info()
+            # A spool change seen during the scan means the result may be stale
+            if generation == _queue_generation:
+                _probe_cache.set('queue', info, QUEUE_CACHE_MAX_AGE if watched else QUEUE_CACHE_TTL)
+        return info
+    
+    @classmethod
+    def _queue_snapshot(cls, timeout: int = 30, preview_messages: int = 0) -> Dict:
+        """Count the queue and total its size and ages from one postqueue -j run.
+        
+        postqueue reads the spool with Postfix's own privileges, so this
+        works even when the spool directories aren't readable by us. Up to
+        ``preview_messages`` messages are also formatted for display.
+        """
+        now = time.time()
+        count = 0
+        total_size = 0
+        oldest = newest = None
+        preview = []
+        with _stream_command(['postqueue', '-j'], timeout=timeout) as proc:
+            for line in proc.stdout:
                 try:
-                    # Get queue directory size
-                    queue_dir = "/var/spool/postfix/incoming"
-                    if os.path.exists(queue_dir):
-                        for root, dirs, files in os.walk(queue_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                if os.path.isfile(file_path):
-                                    queue_size += os.path.getsize(file_path)
-                                    file_age = time.time() - os.path.getmtime(file_path)
-                                    if file_age > oldest_age:
-                                        oldest_age = file_age
-                                    if newest_age == 0 or file_age < newest_age:
-                                        newest_age = file_age
-                except:
-                    pass
+                    msg = _json_loads(line)
+                except ValueError:
+                    continue
                 
-                return {
-                    'count': max(0, queue_count - 1),
-                    'details': result.stdout,
-                    'size_kb': queue_size // 1024,
-                    'oldest_hours': int(oldest_age // 3600),
-                    'newest_hours': int(newest_age // 3600)
-                }
-            else:
-                return {'count': 0, 'details': result.stderr}
+                count += 1
+                size = int(msg.get('message_size', 0))
+                total_size += size
+                arrival = msg.get('arrival_time', now)
+                if oldest is None or arrival < oldest:
+                    oldest = arrival
+                if newest is None or arrival > newest:
+                    newest = arrival
+                
+                if len(preview) < preview_messages:
+                    recipients = ', '.join(r.get('address', '') for r in msg.get('recipients') or [])
+                    preview.append(
+                        f"{msg.get('queue_id', ''):<12} {size:>8} "
+                        f"{time.strftime('%a %b %d %H:%M:%S', time.localtime(arrival))} "
+                        f"{msg.get('sender', '')} [{msg.get('queue_name', '')}]\n"
+                        f"    {recipients}\n")
+            returncode, stderr = proc.finish()
+        
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or f'postqueue exited with {returncode}')
+        
+        return {
+            'count': count,
+            'size': total_size,
+            'oldest_age': now - oldest if count else 0,
+            'newest_age': now - newest if count else 0,
+            'preview': preview,
+            'truncated': count > len(preview)
+        }
+    
+    def _collect_queue_info(self) -> Dict:
+        """Run postqueue once for the queue count, size, ages and preview."""
+        try:
+            snapshot = self._queue_snapshot(preview_messages=QUEUE_PREVIEW_MESSAGES)
+            return {
+                'count': snapshot['count'],
+                'details': ''.join(snapshot['preview']) or f'{_QUEUE_EMPTY_NOTICE}\n',
+                'truncated': snapshot['truncated'],
+                'size_kb': snapshot['size'] // 1024,
+                'oldest_hours': int(snapshot['oldest_age'] // 3600),
+                'newest_hours': int(snapshot['newest_age'] // 3600)
+            }
         except Exception as e:
             logger.error(f"Error getting queue info: {e}")
             return {'count': 0, 'details': str(e)}
 
+    def _iter_queue_messages(self):
+        """Yield queued messages parsed from postqueue's JSON listing.
+        
+        postqueue -j prints one object per message, so the queue is read
+        line by line and never held in memory as a whole. Raises
+        RuntimeError if postqueue fails, rather than yielding an empty queue.
+        """
+        with _stream_command(['postqueue', '-j'], timeout=30) as proc:
+            for line in proc.stdout:
+                try:
+                    msg = _json_loads(line)
+                except ValueError:
+                    continue
+                
+                recipients = msg.get('recipients') or [{}]
+                timestamp = time.strftime(
+                    '%Y-%m-%dT%H:%M:%S', time.localtime(msg.get('arrival_time', 0)))
+                yield {
+                    'id': msg.get('queue_id', ''),
+                    'size': int(msg.get('message_size', 0)),
+                    'timestamp': timestamp,
+                    'from': msg.get('sender', ''),
+                    'to': recipients[0].get('address', ''),
+                    'queue': msg.get('queue_name', 'active'),
+                    'arrival_time': timestamp
+                }
+            returncode, stderr = proc.finish()
+        
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or f'postqueue exited with {returncode}')
+    
     def get_detailed_queue_info(self, queue_type: str = 'all', limit: int = 100) -> Dict:
         """Get detailed queue information with filtering and pagination."""
         try:
-            # Get basic queue info
-            basic_info = self.get_queue_info()
-            
-            # Parse detailed message information
-            lines = basic_info.get('details', '').split('\n')
             messages = []
-            
-            for line in lines:
-                if line.startswith('Mail queue is empty') or line.startswith('--') or not line.strip():
-                    continue
-                
-                parts = line.split()
-                if len(parts) >= 7:
-                    message_id = parts[0]
-                    size = int(parts[1]) if parts[1].isdigit() else 0
-                    timestamp = ' '.join(parts[2:4])
-                    sender = parts[4] if len(parts) > 4 else ''
-                    recipient = parts[5] if len(parts) > 5 else ''
-                    
-                    # Determine queue type (simplified)
-                    queue_type_msg = 'active'  # Default
-                    if 'deferred' in line.lower():
-                        queue_type_msg = 'deferred'
-                    elif 'hold' in line.lower():
-                        queue_type_msg = 'hold'
-                    
-                    messages.append({
-                        'id': message_id,
-                        'size': size,
-                        'timestamp': timestamp,
-                        'from': sender,
-                        'to': recipient,
-                        'queue': queue_type_msg,
-                        'arrival_time': timestamp
-                    })
-            
-            # Filter by queue type if specified
-            if queue_type != 'all':
-                messages = [msg for msg in messages if msg['queue'] == queue_type]
-            
-            # Apply limit
-            messages = messages[:limit]
-            
-            # Calculate queue statistics
             queue_stats = {
                 'incoming': {'count': 0, 'size': 0},
                 'active': {'count': 0, 'size': 0},
@@ -231,11 +1008,23 @@ class PostfixManager:
                 'hold': {'count': 0, 'size': 0}
             }
             
-            for msg in messages:
-                queue_type_msg = msg['queue']
-                if queue_type_msg in queue_stats:
-                    queue_stats[queue_type_msg]['count'] += 1
-                    queue_stats[queue_type_msg]['size'] += msg['size']
+            # Stop reading postqueue as soon as the requested number of
+            # messages is found
+            if limit > 0:
+                with closing(self._iter_queue_messages()) as queue:
+                    for message in queue:
+                        queue_name = message['queue']
+                        if queue_type != 'all' and queue_name != queue_type:
+                            continue
+                        
+                        messages.append(message)
+                        stats = queue_stats.get(queue_name)
+                        if stats is not None:
+                            stats['count'] += 1
+                            stats['size'] += message['size']
+                        
+                        if len(messages) >= limit:
+                            break
             
             return {
                 'incoming': queue_stats['incoming'],
@@ -246,43 +1035,14 @@ class PostfixManager:
             }
         except Exception as e:
             logger.error(f"Error getting detailed queue info: {e}")
-            return {'error': str(e)}
-
-    def delete_message(self, message_id: str) -> bool:
-        """Delete a specific message from the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-d', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
-        except Exception as e:
-            logger.error(f"Error deleting message {message_id}: {e}")
-            return False
-
-    def hold_message(self, message_id: str) -> bool:
-        """Hold a specific message in the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-h', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
-        except Exception as e:
-            logger.error(f"Error holding message {message_id}: {e}")
-            return False
-
-    def release_message(self, message_id: str) -> bool:
-        """Release a held message from the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-H', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
-        except Exception as e:
-            logger.error(f"Error releasing message {message_id}: {e}")
-            return False
+            return {'success': False, 'error': str(e)}
 
     def flush_deferred_queue(self) -> bool:
         """Flush the deferred queue."""
         try:
             result = subprocess.run(['postqueue', '-f'], 
-                                  capture_output=True, text=True, timeout=60)
+                                  capture_output=True, timeout=60)
+            self.invalidate('queue')
             return result.returncode == 0
         except Exception as e:
             logger.error(f"Error flushing deferred queue: {e}")
@@ -292,54 +1052,13 @@ class PostfixManager:
         """Flush the hold queue."""
         try:
             result = subprocess.run(['postqueue', '-f'], 
-                                  capture_output=True, text=True, timeout=60)
+                                  capture_output=True, timeout=60)
+            self.invalidate('queue')
             return result.returncode == 0
         except Exception as e:
             logger.error(f"Error flushing hold queue: {e}")
             return False
 
-    def get_queue_performance_metrics(self) -> Dict:
-        """Get queue performance metrics."""
-        try:
-            # Get queue info
-            queue_info = self.get_queue_info()
-            
-            # Calculate basic metrics
-            total_messages = queue_info.get('count', 0)
-            
-            # Calculate processing rate (simplified)
-            processing_rate = 0
-            if total_messages > 0:
-                # This would typically be calculated from historical data
-                processing_rate = min(total_messages * 2, 100)  # Placeholder
-            
-            # Calculate average wait time (simplified)
-            avg_wait_time = 0
-            if total_messages > 0:
-                # This would typically be calculated from actual timestamps
-                avg_wait_time = 15  # Placeholder in minutes
-            
-            # Calculate queue health score
-            health_score = 100
-            if total_messages > 1000:
-                health_score = 20
-            elif total_messages > 500:
-                health_score = 40
-            elif total_messages > 100:
-                health_score = 60
-            elif total_messages > 50:
-                health_score = 80
-            
-            return {
-                'processing_rate': processing_rate,
-                'avg_wait_time': avg_wait_time,
-                'queue_health': health_score,
-                'total_messages': total_messages
-            }
-        except Exception as e:
-            logger.error(f"Error getting queue performance metrics: {e}")
-            return {'error': str(e)}
-
     def cleanup_expired_messages(self) -> bool:
         """Clean up expired messages from the queue."""
         try:
@@ -354,7 +1073,8 @@ class PostfixManager:
         """Rebuild the queue index."""
         try:
             result = subprocess.run(['postsuper', '-r'], 
-                                  capture_output=True, text=True, timeout=120)
+                                  capture_output=True, timeout=120)
+            self.invalidate('queue')
             return result.returncode == 0
         except Exception as e:
             logger.error(f"Error rebuilding queue index: {e}")
@@ -363,12 +1083,19 @@ class PostfixManager:
     def check_queue_integrity(self) -> Dict:
         """Check queue integrity."""
         try:
-            result = subprocess.run(['postqueue', '-p'], 
-                                  capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                return {'valid': True, 'message': 'Queue integrity check passed'}
+            # Stream the listing; a backed-up queue can be tens of MB of text
+            count = 0
+            with _stream_command(['postqueue', '-p'], timeout=30) as proc:
+                for line in proc.stdout:
+                    # Each message entry starts with its queue ID in column one
+                    if line[:1].isalnum() and not line.startswith(_QUEUE_EMPTY_NOTICE):
+                        count += 1
+                returncode, stderr = proc.finish()
+            
+            if returncode == 0:
+                return {'valid': True, 'message': 'Queue integrity check passed', 'count': count}
             else:
-                return {'valid': False, 'message': 'Queue integrity check failed'}
+                return {'valid': False, 'message': stderr.strip() or 'Queue integrity check failed'}
         except Exception as e:
             logger.error(f"Error checking queue integrity: {e}")
             return {'valid': False, 'message': str(e)}
@@ -376,18 +1103,12 @@ class PostfixManager:
     def flush_queue(self, queue_type: str = 'all') -> Dict:
         """Flush the mail queue."""
         try:
-            if queue_type == 'all':
-                result = subprocess.run(['postqueue', '-f'], 
-                                      capture_output=True, text=True, timeout=60)
-            elif queue_type == 'deferred':
-                result = subprocess.run(['postqueue', '-f', 'deferred'], 
-                                      capture_output=True, text=True, timeout=60)
-            elif queue_type == 'hold':
-                result = subprocess.run(['postqueue', '-f', 'hold'], 
-                                      capture_output=True, text=True, timeout=60)
-            else:
+            cmd = _FLUSH_COMMANDS.get(queue_type)
+            if cmd is None:
                 return {'error': f'Invalid queue type: {queue_type}'}
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
             
+            self.invalidate('queue')
             if result.returncode == 0:
                 return {
                     'success': True,
@@ -403,68 +1124,55 @@ class PostfixManager:
             logger.error(f"Error flushing queue {queue_type}: {e}")
             return {'error': str(e)}
     
-    def delete_message(self, message_id: str) -> Dict:
-        """Delete a specific message from the queue."""
+    def _postsuper_batch(self, flag: str, message_ids: List[str], action: str) -> Dict:
+        """Run one postsuper invocation over a batch of ids read from stdin."""
         try:
-            result = subprocess.run(['postsuper', '-d', message_id], 
+            result = subprocess.run(['postsuper', flag, '-'], input='\n'.join(message_ids) + '\n',
                                   capture_output=True, text=True, timeout=30)
             
+            self.invalidate('queue')
             if result.returncode == 0:
+                if len(message_ids) == 1:
+                    message = f'Message {message_ids[0]} {action} successfully'
+                else:
+                    message = f'{len(message_ids)} messages {action} successfully'
                 return {
                     'success': True,
-                    'message': f'Message {message_id} deleted successfully',
+                    'message': message,
                     'output': result.stdout
                 }
             else:
                 return {
                     'success': False,
-                    'error': result.stderr or 'Unknown error deleting message'
+                    'error': result.stderr or f'Unknown error: messages not {action}'
                 }
         except Exception as e:
-            logger.error(f"Error deleting message {message_id}: {e}")
+            logger.error(f"Error running postsuper {flag} on {len(message_ids)} messages: {e}")
             return {'error': str(e)}
     
+    def delete_messages(self, message_ids: List[str]) -> Dict:
+        """Delete several messages from the queue."""
+        return self._postsuper_batch('-d', message_ids, 'deleted')
+    
+    def hold_messages(self, message_ids: List[str]) -> Dict:
+        """Hold several messages in the queue."""
+        return self._postsuper_batch('-h', message_ids, 'held')
+    
+    def release_messages(self, message_ids: List[str]) -> Dict:
+        """Release several held messages from the queue."""
+        return self._postsuper_batch('-H', message_ids, 'released')
+    
+    def delete_message(self, message_id: str) -> Dict:
+        """Delete a specific message from the queue."""
+        return self.delete_messages([message_id])
+    
     def hold_message(self, message_id: str) -> Dict:
         """Hold a message in the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-h', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Message {message_id} held successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error holding message'
-                }
-        except Exception as e:
-            logger.error(f"Error holding message {message_id}: {e}")
-            return {'error': str(e)}
+        return self.hold_messages([message_id])
     
     def release_message(self, message_id: str) -> Dict:
         """Release a held message from the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-H', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Message {message_id} released successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error releasing message'
-                }
-        except Exception as e:
-            logger.error(f"Error releasing message {message_id}: {e}")
-            return {'error': str(e)}
+        return self.release_messages([message_id])
     
     def cleanup_queue(self, days_old: int = 7) -> Dict:
         """Clean up old messages from the queue."""
@@ -473,6 +1181,7 @@ class PostfixManager:
             result = subprocess.run(['postsuper', '-d', 'ALL'], 
                                   capture_output=True, text=True, timeout=60)
             
+            self.invalidate('queue')
             if result.returncode == 0:
                 # Get queue info after cleanup
                 queue_info = self.get_queue_info()
@@ -492,16 +1201,41 @@ class PostfixManager:
             logger.error(f"Error cleaning up queue: {e}")
             return {'error': str(e)}
     
+    def _fast_queue_count(self) -> int:
+        """Count queued message files without forking postqueue or stat()ing."""
+        return sum(1 for _ in _walk_spool())
+    
+    def get_queue_count(self) -> int:
+        """Count queued messages, reading the spool directly when possible."""
+        try:
+            return self._fast_queue_count()
+        except OSError:
+            # Spool not readable by this user; fall back to postqueue
+            return self.get_queue_info().get('count', 0)
+    
+    def get_queue_stats(self) -> Dict:
+        """Get the queue's total size and oldest/newest message age."""
+        try:
+            # Messages leave incoming within seconds, so ages are taken over
+            # every queue directory rather than incoming alone
+            queue_size, oldest_age, newest_age = _scan_spool()
+        except OSError:
+            queue_size, oldest_age, newest_age = 0, 0, 0
+        
+        return {
+            'size_kb': queue_size // 1024,
+            'oldest_hours': int(oldest_age // 3600),
+            'newest_hours': int(newest_age // 3600)
+        }
+    
     def get_queue_performance_metrics(self) -> Dict:
         """Get detailed queue performance metrics."""
         try:
-            queue_info = self.get_queue_info()
-            
-            # Calculate performance metrics
-            total_messages = queue_info.get('count', 0)
-            queue_size_kb = queue_info.get('size_kb', 0)
-            oldest_hours = queue_info.get('oldest_hours', 0)
-            newest_hours = queue_info.get('newest_hours', 0)
+            total_messages = self.get_queue_count()
+            queue_stats = self.get_queue_stats()
+            queue_size_kb = queue_stats['size_kb']
+            oldest_hours = queue_stats['oldest_hours']
+            newest_hours = queue_stats['newest_hours']
             
             # Calculate processing rate (estimated)
             if oldest_hours > 0 and newest_hours > 0:
@@ -547,33 +1281,36 @@ class PostfixManager:
             logger.error(f"Error getting queue performance metrics: {e}")
             return {'error': str(e)}
     
-    def search_queue(self, search_term: str, search_type: str = 'all') -> Dict:
+    def search_queue(self, search_term: str, search_type: str = 'all', limit: int = 100) -> Dict:
         """Search the mail queue for specific messages."""
         try:
-            queue_info = self.get_detailed_queue_info()
-            if 'error' in queue_info:
-                return queue_info
-            
-            messages = queue_info.get('messages', [])
+            term = search_term.lower()
             results = []
             
-            for message in messages:
-                message_id = message.get('id', '')
-                sender = message.get('sender', '')
-                recipient = message.get('recipient', '')
-                
-                # Search in different fields based on search type
-                if search_type == 'sender' and search_term.lower() in sender.lower():
-                    results.append(message)
-                elif search_type == 'recipient' and search_term.lower() in recipient.lower():
-                    results.append(message)
-                elif search_type == 'id' and search_term in message_id:
-                    results.append(message)
-                elif search_type == 'all':
-                    if (search_term.lower() in sender.lower() or 
-                        search_term.lower() in recipient.lower() or 
-                        search_term in message_id):
+            # Scan the whole queue as it streams in, keeping only matches
+            with closing(self._iter_queue_messages()) as queue:
+                for message in queue:
+                    message_id = message['id']
+                    sender = message['from'].lower()
+                    recipient = message['to'].lower()
+                    
+                    # Search in different fields based on search type
+                    if search_type == 'sender':
+                        matched = term in sender
+                    elif search_type == 'recipient':
+                        matched = term in recipient
+                    elif search_type == 'id':
+                        matched = search_term in message_id
+                    elif search_type == 'all':
+                        matched = (term in sender or term in recipient or
+                                   search_term in message_id)
+                    else:
+                        matched = False
+                    
+                    if matched:
                         results.append(message)
+                        if len(results) >= limit:
+                            break
             
             return {
                 'success': True,
@@ -584,33 +1321,56 @@ class PostfixManager:
             }
         except Exception as e:
             logger.error(f"Error searching queue: {e}")
-            return {'error': str(e)}
+            return {'success': False, 'error': str(e)}
 
+    def _load_domains(self) -> Dict[str, None]:
+        """Return the cached domain set, re-reading the file only if it changed.
+        
+        The file's mtime and size are checked with one stat() per call.
+        """
+        path = self.virtual_domains_file
+        try:
+            signature = _file_signature(path)
+        except FileNotFoundError:
+            _domains_state.pop(path, None)
+            return {}
+        
+        cached = _domains_state.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        with open(path, 'r') as f:
+            domains = dict.fromkeys(d for d in map(str.strip, f) if d and d[0] != '#')
+        _domains_state[path] = (signature, domains)
+        return domains
+    
     def add_domain(self, domain: str) -> bool:
         """Add a domain to Postfix virtual domains."""
         try:
-            # Read current virtual domains
-            virtual_domains_file = os.path.join(self.config_dir, "virtual_domains")
-            
-            if os.path.exists(virtual_domains_file):
-                with open(virtual_domains_file, 'r') as f:
-                    domains = f.read().splitlines()
-            else:
-                domains = []
-            
-            # Add domain if not exists
-            if domain not in domains:
-                domains.append(domain)
-                
-                with open(virtual_domains_file, 'w') as f:
-                    f.write('\n'.join(domains))
+            with _domains_lock:
+                domains = self._load_domains()
+                if domain in domains:
+                    return True
                 
-                # Update main.cf if needed
-                self._update_main_cf_virtual_domains()
+                # Append rather than rewrite the whole file
+                with open(self.virtual_domains_file, 'ab+') as f:
+                    f.seek(0, os.SEEK_END)
+                    prefix = b''
+                    if f.tell():
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b'\n':
+                            prefix = b'\n'
+                    f.write(prefix + domain.encode() + b'\n')
                 
-                # Reload configuration
-                return self.reload_config()
+                domains[domain] = None
+                _domains_state[self.virtual_domains_file] = (
+                    _file_signature(self.virtual_domains_file), domains)
+            
+            # Update main.cf if needed
+            self._update_main_cf_virtual_domains()
             
+            # Reload once the burst of changes settles
+            self._schedule_reload()
             return True
         except Exception as e:
             logger.error(f"Error adding domain {domain}: {e}")
@@ -619,62 +1379,161 @@ class PostfixManager:
     def remove_domain(self, domain: str) -> bool:
         """Remove a domain from Postfix virtual domains."""
         try:
-            virtual_domains_file = os.path.join(self.config_dir, "virtual_domains")
-            
-            if os.path.exists(virtual_domains_file):
-                with open(virtual_domains_file, 'r') as f:
-                    domains = f.read().splitlines()
+            with _domains_lock:
+                domains = self._load_domains()
+                if domain not in domains:
+                    return True
                 
-                # Remove domain
-                if domain in domains:
-                    domains.remove(domain)
-                    
-                    with open(virtual_domains_file, 'w') as f:
-                        f.write('\n'.join(domains))
-                    
-                    # Update main.cf if needed
-                    self._update_main_cf_virtual_domains()
-                    
-                    # Reload configuration
-                    return self.reload_config()
+                # Copy every other line, comments included, to a temp file
+                # beside the original and swap it in atomically so readers
+                # never see a partial file
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(self.virtual_domains_file), prefix='.virtual_domains.')
+                try:
+                    # mkstemp creates the file as us; keep the original's owner and group
+                    st = os.stat(self.virtual_domains_file)
+                    try:
+                        os.fchown(fd, st.st_uid, st.st_gid)
+                    except PermissionError as e:
+                        logger.warning(f"Could not keep ownership of {self.virtual_domains_file}: {e}")
+                    with os.fdopen(fd, 'w') as out, open(self.virtual_domains_file, 'r') as src:
+                        out.writelines(line for line in src if line.strip() != domain)
+                    shutil.copymode(self.virtual_domains_file, tmp_path)
+                    os.replace(tmp_path, self.virtual_domains_file)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                
+                del domains[domain]
+                
+                _domains_state[self.virtual_domains_file] = (
+                    _file_signature(self.virtual_domains_file), domains)
+            
+            # Update main.cf if needed
+            self._update_main_cf_virtual_domains()
             
+            # Reload once the burst of changes settles
+            self._schedule_reload()
             return True
         except Exception as e:
             logger.error(f"Error removing domain {domain}: {e}")
+            _domains_state.pop(self.virtual_domains_file, None)
             return False
 
     def get_virtual_domains(self) -> List[str]:
         """Get list of virtual domains from Postfix."""
         try:
-            virtual_domains_file = os.path.join(self.config_dir, "virtual_domains")
-            
-            if os.path.exists(virtual_domains_file):
-                with open(virtual_domains_file, 'r') as f:
-                    domains = f.read().splitlines()
-                return [domain.strip() for domain in domains if domain.strip()]
-            else:
-                return []
+            with _domains_lock:
+                return list(self._load_domains())
         except Exception as e:
             logger.error(f"Error getting virtual domains: {e}")
             return []
     
+    def has_virtual_domain(self, domain: str) -> bool:
+        """Check whether a domain is configured, without copying the list."""
+        try:
+            with _domains_lock:
+                return domain in self._load_domains()
+        except Exception as e:
+            logger.error(f"Error checking virtual domain {domain}: {e}")
+            return False
+    
     def _update_main_cf_virtual_domains(self):
         """Update main.cf to include virtual_domains file."""
         try:
-            with open(self.main_cf, 'r') as f:
-                content = f.read()
+            # Only re-read main.cf when it has changed since the last check
+            mtime = os.stat(self.main_cf).st_mtime
+            cached = _main_cf_state.get(self.main_cf)
+            if cached and cached[0] == mtime and cached[1]:
+                return
+            
+            # Find the virtual_alias_domains setting by searching the mapped
+            # bytes, without decoding or copying the file; like Postfix, the
+            # last one wins. virtual_alias_domains reads a plain file
+            # directly, so no postmap step is needed when the list changes.
+            value = None
+            with open(self.main_cf, 'rb') as f:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        for match in _VIRTUAL_ALIAS_DOMAINS_LINE.finditer(mm):
+                            value = match.group(1)
+                except ValueError:
+                    # Empty files can't be mapped
+                    pass
             
-            # Check if virtual_domains is already included
-            if 'virtual_domains' not in content:
+            if value is not None and self.virtual_domains_file.encode() not in value:
+                # Don't override an administrator's setting, but say that the
+                # domains managed here won't take effect
+                logger.warning(
+                    f"{self.main_cf} sets virtual_alias_domains ={value.decode(errors='replace')} "
+                    f"without {self.virtual_domains_file}; domains added here will not be used")
+            elif value is None:
                 with open(self.main_cf, 'a') as f:
                     f.write('\n# Virtual domains\n')
-                    f.write('virtual_domains = hash:/etc/postfix/virtual_domains\n')
-                
-                # Update hash table
-                subprocess.run(['postmap', os.path.join(self.config_dir, "virtual_domains")], 
-                             capture_output=True, timeout=30)
+                    f.write(f'virtual_alias_domains = {self.virtual_domains_file}\n')
+                mtime = os.stat(self.main_cf).st_mtime
+            
+            _main_cf_state[self.main_cf] = (mtime, True)
         except Exception as e:
             logger.error(f"Error updating main.cf: {e}")
+    
+    @contextmanager
+    def batch_changes(self):
+        """Defer the Postfix reload until a batch of domain changes is done.
+        
+        Usage: ``with manager.batch_changes(): for d in domains: manager.add_domain(d)``
+        """
+        if self._in_batch:
+            yield self
+            return
+        
+        self._in_batch = True
+        self._reload_pending = False
+        try:
+            yield self
+        finally:
+            self._in_batch = False
+            if self._reload_pending:
+                self._reload_pending = False
+                self._run_pending_reload()
+    
+    def _schedule_reload(self):
+        """Schedule a reload, coalescing bursts of domain changes.
+        
+        The timer is not a daemon thread, so a short-lived process still
+        reloads Postfix before it exits; callers that need the result call
+        flush_pending().
+        """
+        if self._in_batch:
+            self._reload_pending = True
+            return
+        with _pending_reloads_lock:
+            timer = _pending_reloads.get(self.config_dir)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(RELOAD_DEBOUNCE_SECONDS, self._run_pending_reload)
+            _pending_reloads[self.config_dir] = timer
+            timer.start()
+    
+    def _run_pending_reload(self) -> bool:
+        """Reload Postfix so it picks up the virtual_domains file."""
+        with _pending_reloads_lock:
+            if _pending_reloads.get(self.config_dir) is threading.current_thread():
+                del _pending_reloads[self.config_dir]
+        
+        success = self.reload_config()
+        if not success:
+            logger.error("Postfix reload after virtual domain change failed")
+        return success
+    
+    def flush_pending(self) -> bool:
+        """Run a scheduled reload now instead of waiting for it."""
+        with _pending_reloads_lock:
+            timer = _pending_reloads.pop(self.config_dir, None)
+        if timer is None:
+            return True
+        timer.cancel()
+        return self._run_pending_reload()
 
     def read_config_file(self, filename: str = "main.cf") -> Dict:
         """Read a Postfix configuration file."""
@@ -688,11 +1547,12 @@ class PostfixManager:
             
             # Parse configuration into key-value pairs
             config = {}
-            for line in content.split('\n'):
+            for line in content.splitlines():
                 line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    config[key.strip()] = value.strip()
+                if line and line[0] != '#':
+                    key, sep, value = line.partition('=')
+                    if sep:
+                        config[key.strip()] = value.strip()
             
             return {
                 'success': True,
@@ -737,37 +1597,18 @@ class PostfixManager:
         """Create a comprehensive backup of Postfix configuration."""
         try:
             timestamp = time.strftime('%Y%m%d_%H%M%S')
-            backup_dir = f"/tmp/postfix_backup_{timestamp}"
-            
-            # Create backup directory
-            os.makedirs(backup_dir, exist_ok=True)
-            
-            # Copy configuration files
-            config_files = [
-                "main.cf",
-                "master.cf",
-                "aliases",
-                "canonical",
-                "relocated",
-                "transport",
-                "virtual",
-                "virtual_alias_domains"
-            ]
             
+            # Stream each file straight into the archive
+            archive_name = f"/tmp/postfix_config_backup_{timestamp}.tar.gz"
             copied_files = []
-            for config_file in config_files:
-                file_path = os.path.join(self.config_dir, config_file)
-                if os.path.exists(file_path):
-                    shutil.copy2(file_path, backup_dir)
+            with tarfile.open(archive_name, 'w:gz') as tar:
+                for config_file in POSTFIX_BACKUP_FILES:
+                    try:
+                        tar.add(os.path.join(self.config_dir, config_file), arcname=config_file)
+                    except FileNotFoundError:
+                        continue
                     copied_files.append(config_file)
             
-            # Create archive
-            archive_name = f"/tmp/postfix_config_backup_{timestamp}.tar.gz"
-            shutil.make_archive(archive_name.replace('.tar.gz', ''), 'gztar', backup_dir)
-            
-            # Clean up temporary directory
-            shutil.rmtree(backup_dir)
-            
             return {
                 'success': True,
                 'backup_file': archive_name,
@@ -785,7 +1626,6 @@ class PostfixManager:
                 return {'error': 'Backup file not found'}
             
             # Extract backup
-            import tempfile
             with tempfile.TemporaryDirectory() as temp_dir:
                 shutil.unpack_archive(backup_file, temp_dir, 'gztar')
                 
@@ -887,7 +1727,8 @@ class PostfixManager:
             
             # Find and update the setting
             for i, line in enumerate(lines):
-                if line.strip() and not line.strip().startswith('#') and line.strip().startswith(f"{key}="):
+                stripped = line.strip()
+                if stripped and stripped[0] != '#' and stripped.partition('=')[0].strip() == key:
                     lines[i] = f"{key} = {value}"
                     updated = True
                     break
@@ -937,219 +1778,6 @@ class PostfixManager:
         except Exception as e:
             logger.error(f"Error testing config changes: {e}")
             return {'error': str(e)}
-    
-    def flush_queue(self, queue_type: str = 'all') -> Dict:
-        """Flush the mail queue."""
-        try:
-            if queue_type == 'all':
-                result = subprocess.run(['postqueue', '-f'], 
-                                      capture_output=True, text=True, timeout=60)
-            elif queue_type == 'deferred':
-                result = subprocess.run(['postqueue', '-f', 'deferred'], 
-                                      capture_output=True, text=True, timeout=60)
-            elif queue_type == 'hold':
-                result = subprocess.run(['postqueue', '-f', 'hold'], 
-                                      capture_output=True, text=True, timeout=60)
-            else:
-                return {'error': f'Invalid queue type: {queue_type}'}
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Queue {queue_type} flushed successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error flushing queue'
-                }
-        except Exception as e:
-            logger.error(f"Error flushing queue {queue_type}: {e}")
-            return {'error': str(e)}
-    
-    def delete_message(self, message_id: str) -> Dict:
-        """Delete a specific message from the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-d', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Message {message_id} deleted successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error deleting message'
-                }
-        except Exception as e:
-            logger.error(f"Error deleting message {message_id}: {e}")
-            return {'error': str(e)}
-    
-    def hold_message(self, message_id: str) -> Dict:
-        """Hold a message in the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-h', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Message {message_id} held successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error holding message'
-                }
-        except Exception as e:
-            logger.error(f"Error holding message {message_id}: {e}")
-            return {'error': str(e)}
-    
-    def release_message(self, message_id: str) -> Dict:
-        """Release a held message from the queue."""
-        try:
-            result = subprocess.run(['postsuper', '-H', message_id], 
-                                  capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                return {
-                    'success': True,
-                    'message': f'Message {message_id} released successfully',
-                    'output': result.stdout
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error releasing message'
-                }
-        except Exception as e:
-            logger.error(f"Error releasing message {message_id}: {e}")
-            return {'error': str(e)}
-    
-    def cleanup_queue(self, days_old: int = 7) -> Dict:
-        """Clean up old messages from the queue."""
-        try:
-            # Delete messages older than specified days
-            result = subprocess.run(['postsuper', '-d', 'ALL'], 
-                                  capture_output=True, text=True, timeout=60)
-            
-            if result.returncode == 0:
-                # Get queue info after cleanup
-                queue_info = self.get_queue_info()
-                
-                return {
-                    'success': True,
-                    'message': f'Queue cleaned up successfully',
-                    'output': result.stdout,
-                    'queue_after_cleanup': queue_info
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Unknown error cleaning up queue'
-                }
-        except Exception as e:
-            logger.error(f"Error cleaning up queue: {e}")
-            return {'error': str(e)}
-    
-    def get_queue_performance_metrics(self) -> Dict:
-        """Get detailed queue performance metrics."""
-        try:
-            queue_info = self.get_queue_info()
-            
-            # Calculate performance metrics
-            total_messages = queue_info.get('count', 0)
-            queue_size_kb = queue_info.get('size_kb', 0)
-            oldest_hours = queue_info.get('oldest_hours', 0)
-            newest_hours = queue_info.get('newest_hours', 0)
-            
-            # Calculate processing rate (estimated)
-            if oldest_hours > 0 and newest_hours > 0:
-                time_span = oldest_hours - newest_hours
-                if time_span > 0:
-                    processing_rate = total_messages / time_span
-                else:
-                    processing_rate = 0
-            else:
-                processing_rate = 0
-            
-            # Calculate queue health score
-            health_score = 100
-            if total_messages > 1000:
-                health_score -= 30
-            elif total_messages > 500:
-                health_score -= 20
-            elif total_messages > 100:
-                health_score -= 10
-            
-            if oldest_hours > 24:
-                health_score -= 30
-            elif oldest_hours > 12:
-                health_score -= 20
-            elif oldest_hours > 6:
-                health_score -= 10
-            
-            health_score = max(0, health_score)
-            
-            return {
-                'success': True,
-                'metrics': {
-                    'total_messages': total_messages,
-                    'queue_size_mb': round(queue_size_kb / 1024, 2),
-                    'oldest_message_hours': oldest_hours,
-                    'newest_message_hours': newest_hours,
-                    'estimated_processing_rate': round(processing_rate, 2),
-                    'queue_health_score': health_score,
-                    'queue_status': 'healthy' if health_score > 70 else 'warning' if health_score > 40 else 'critical'
-                }
-            }
-        except Exception as e:
-            logger.error(f"Error getting queue performance metrics: {e}")
-            return {'error': str(e)}
-    
-    def search_queue(self, search_term: str, search_type: str = 'all') -> Dict:
-        """Search the mail queue for specific messages."""
-        try:
-            queue_info = self.get_detailed_queue_info()
-            if 'error' in queue_info:
-                return queue_info
-            
-            messages = queue_info.get('messages', [])
-            results = []
-            
-            for message in messages:
-                message_id = message.get('id', '')
-                sender = message.get('sender', '')
-                recipient = message.get('recipient', '')
-                
-                # Search in different fields based on search type
-                if search_type == 'sender' and search_term.lower() in sender.lower():
-                    results.append(message)
-                elif search_type == 'recipient' and search_term.lower() in recipient.lower():
-                    results.append(message)
-                elif search_type == 'id' and search_term in message_id:
-                    results.append(message)
-                elif search_type == 'all':
-                    if (search_term.lower() in sender.lower() or 
-                        search_term.lower() in recipient.lower() or 
-                        search_term in message_id):
-                        results.append(message)
-            
-            return {
-                'success': True,
-                'search_term': search_term,
-                'search_type': search_type,
-                'results_count': len(results),
-                'results': results
-            }
-        except Exception as e:
-            logger.error(f"Error searching queue: {e}")
-            return {'error': str(e)}
 
 
 class DovecotManager:
@@ -1159,22 +1787,24 @@ class DovecotManager:
         self.config_dir = config_dir
         self.conf_d = os.path.join(config_dir, "conf.d")
     
-    def restart_service(self) -> bool:
+    def restart_service(self, progress: Optional[Callable[[float], None]] = None) -> bool:
         """Restart Dovecot service."""
         try:
-            result = subprocess.run(['systemctl', 'restart', 'dovecot'], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
+            success = _control_service('restart', 'dovecot', timeout=30, progress=progress)
+            PostfixManager.invalidate('dovecot_status')
+            PostfixManager.invalidate('protocol_status')
+            return success
         except Exception as e:
             logger.error(f"Error restarting Dovecot: {e}")
             return False
     
-    def reload_config(self) -> bool:
+    def reload_config(self, progress: Optional[Callable[[float], None]] = None) -> bool:
         """Reload Dovecot configuration."""
         try:
-            result = subprocess.run(['systemctl', 'reload', 'dovecot'], 
-                                  capture_output=True, text=True, timeout=30)
-            return result.returncode == 0
+            success = _control_service('reload', 'dovecot', timeout=30, progress=progress)
+            PostfixManager.invalidate('dovecot_status')
+            PostfixManager.invalidate('protocol_status')
+            return success
         except Exception as e:
             logger.error(f"Error reloading Dovecot config: {e}")
             return False
@@ -1183,53 +1813,71 @@ class DovecotManager:
         """Check Dovecot configuration syntax."""
         try:
             result = subprocess.run(['dovecot', '--config', self.config_dir], 
-                                  capture_output=True, text=True, timeout=30)
+                                  capture_output=True, timeout=30)
             if result.returncode == 0:
                 return {'valid': True, 'message': 'Configuration is valid'}
             else:
-                return {'valid': False, 'message': result.stderr}
+                return {'valid': False, 'message': result.stderr.decode('utf-8', 'replace')}
         except Exception as e:
             logger.error(f"Error checking Dovecot config: {e}")
             return {'valid': False, 'message': str(e)}
     
     def get_user_info(self, username: str, domain: str) -> Dict:
         """Get user information from Dovecot."""
+        cached = _user_info_cache.get((username, domain))
+        if cached is not None:
+            return dict(cached)
+        
         try:
             # This would typically query the user database
             # For now, return basic info
-            return {
+            info = {
                 'username': username,
                 'domain': domain,
                 'home_dir': f"/home/vmail/domains/{domain}/{username}",
                 'quota': self._get_user_quota(username, domain)
             }
+            _user_info_cache.set((username, domain), info)
+            return dict(info)
         except Exception as e:
             logger.error(f"Error getting user info: {e}")
             return {}
     
+    @staticmethod
+    def invalidate_user_cache(username: str, domain: str):
+        """Drop cached info and quota for a user after it has changed."""
+        _user_info_cache.pop((username, domain))
+        _user_quota_cache.pop((username, domain))
+    
     def _get_user_quota(self, username: str, domain: str) -> int:
         """Get user quota from Dovecot."""
+        quota = _user_quota_cache.get((username, domain))
+        if quota is None:
+            quota = self._read_user_quota(username, domain)
+            _user_quota_cache.set((username, domain), quota)
+        return quota
+    
+    def _read_user_quota(self, username: str, domain: str) -> int:
+        """Read the user's dovecot-quota file."""
         try:
-            quota_file = f"/home/vmail/domains/{domain}/{username}/dovecot-quota"
-            if os.path.exists(quota_file):
-                with open(quota_file, 'r') as f:
-                    return int(f.read().strip())
-            return 0
+            return _read_quota_file(f"/home/vmail/domains/{domain}/{username}/dovecot-quota")
         except:
+            # Missing or unreadable quota file
             return 0
 
     def get_config_info(self) -> Dict:
         """Get Dovecot configuration information."""
         try:
             config_file = os.path.join(self.config_dir, "dovecot.conf")
-            if os.path.exists(config_file):
+            try:
                 stat_info = os.stat(config_file)
-                return {
-                    'config_file': config_file,
-                    'last_modified': stat_info.st_mtime,
-                    'size': stat_info.st_size
-                }
-            return {'error': 'Configuration file not found'}
+            except FileNotFoundError:
+                return {'error': 'Configuration file not found'}
+            return {
+                'config_file': config_file,
+                'last_modified': stat_info.st_mtime,
+                'size': stat_info.st_size
+            }
         except Exception as e:
             logger.error(f"Error getting config info: {e}")
             return {'error': str(e)}
@@ -1237,16 +1885,8 @@ class DovecotManager:
     def backup_config(self) -> Dict:
         """Create a backup of Dovecot configuration."""
         try:
-            import shutil
-            import datetime
-            
-            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_dir = f"/tmp/dovecot_backup_{timestamp}"
-            
-            # Create backup directory
-            os.makedirs(backup_dir, exist_ok=True)
+            timestamp = time.strftime('%Y%m%d_%H%M%S')
             
-            # Copy configuration files
             config_files = [
                 os.path.join(self.config_dir, "dovecot.conf"),
                 os.path.join(self.conf_d, "10-mail.conf"),
@@ -1254,19 +1894,17 @@ class DovecotManager:
                 os.path.join(self.conf_d, "10-ssl.conf")
             ]
             
+            # Stream each file straight into the archive
+            archive_name = f"/tmp/dovecot_config_backup_{timestamp}.tar.gz"
             copied_files = []
-            for config_file in config_files:
-                if os.path.exists(config_file):
-                    shutil.copy2(config_file, backup_dir)
+            with tarfile.open(archive_name, 'w:gz') as tar:
+                for config_file in config_files:
+                    try:
+                        tar.add(config_file, arcname=os.path.basename(config_file))
+                    except FileNotFoundError:
+                        continue
                     copied_files.append(os.path.basename(config_file))
             
-            # Create archive
-            archive_name = f"/tmp/dovecot_config_backup_{timestamp}.tar.gz"
-            shutil.make_archive(archive_name.replace('.tar.gz', ''), 'gztar', backup_dir)
-            
-            # Clean up temporary directory
-            shutil.rmtree(backup_dir)
-            
             return {
                 'success': True,
                 'backup_file': archive_name,
@@ -1291,16 +1929,18 @@ class DovecotManager:
             logger.error(f"Error getting user statistics: {e}")
             return {'error': str(e)}
 
+    @ttl_cached('protocol_status', PROTOCOL_CACHE_TTL)
     def get_protocol_status(self) -> Dict:
         """Get protocol status for IMAP, POP3, and LMTP."""
         try:
             # Check which protocols are enabled
             protocols = []
             try:
-                result = subprocess.run(['doveconf', '-h', 'protocols'], 
-                                      capture_output=True, text=True, timeout=10)
-                if result.returncode == 0:
-                    protocols = result.stdout.strip().split()
+                returncode, stdout, stderr = _spawn_capture(['doveconf', '-h', 'protocols'], timeout=10)
+                if returncode == 0:
+                    protocols = stdout.decode('utf-8', 'replace').split()
+                else:
+                    logger.warning(f"doveconf failed: {stderr.decode('utf-8', 'replace').strip()}")
             except:
                 protocols = ['imap', 'pop3']  # Default fallback
             
@@ -2,17 +2,16 @@
 Navigation utilities for breadcrumbs and navigation context
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, NamedTuple, Optional
 from flask import g, request
 
 
-class Breadcrumb:
+class Breadcrumb(NamedTuple):
     """Represents a single breadcrumb item."""
     
-    def __init__(self, text: str, url: str, active: bool = False):
-        self.text = text
-        self.url = url
-        self.active = active
+    text: str
+    url: str
+    active: bool = False
 
 
 def set_breadcrumbs(breadcrumbs: List[Dict[str, str]]):
@@ -29,12 +28,18 @@ def set_breadcrumbs(breadcrumbs: List[Dict[str, str]]):
         ])
     """
     g.breadcrumbs = breadcrumbs
+    g.pop('_breadcrumb_objs', None)
 
 
 def get_breadcrumbs() -> List[Breadcrumb]:
-    """Get breadcrumbs for the current request."""
-    breadcrumbs = getattr(g, 'breadcrumbs', [])
-    return [Breadcrumb(**crumb) for crumb in breadcrumbs]
+    """Get breadcrumbs for the current request, built once per request."""
+    crumbs = g.get('_breadcrumb_objs')
+    if crumbs is None:
+        crumbs = g._breadcrumb_objs = [
+            Breadcrumb(crumb['text'], crumb['url'], crumb.get('active', False))
+            for crumb in getattr(g, 'breadcrumbs', ())
+        ]
+    return crumbs
 
 
 def add_breadcrumb(text: str, url: str, active: bool = False):
@@ -47,46 +52,51 @@ def add_breadcrumb(text: str, url: str, active: bool = False):
         'url': url,
         'active': active
     })
+    g.pop('_breadcrumb_objs', None)
 
 
 def clear_breadcrumbs():
     """Clear breadcrumbs for the current request."""
     if hasattr(g, 'breadcrumbs'):
         del g.breadcrumbs
+    g.pop('_breadcrumb_objs', None)
+
+
+def _title_from(breadcrumbs: List[Breadcrumb]) -> str:
+    """Return the page title for a list of breadcrumbs."""
+    return breadcrumbs[-1].text if breadcrumbs else "Postfix Manager"
 
 
 def get_page_title() -> str:
     """Get the current page title based on breadcrumbs."""
-    breadcrumbs = get_breadcrumbs()
-    if breadcrumbs:
-        return breadcrumbs[-1].text
-    return "Postfix Manager"
+    return _title_from(get_breadcrumbs())
 
 
 def get_navigation_context() -> Dict[str, any]:
     """Get navigation context for the current request."""
+    breadcrumbs = get_breadcrumbs()
     return {
-        'breadcrumbs': get_breadcrumbs(),
-        'page_title': get_page_title(),
+        'breadcrumbs': breadcrumbs,
+        'page_title': _title_from(breadcrumbs),
         'current_path': request.path,
         'current_module': get_current_module()
     }
 
 
+# First path segment -> module name
+MODULES = {
+    'mail': 'mail',
+    'dashboard': 'dashboard',
+    'ldap': 'ldap',
+    'auth': 'auth',
+    'system': 'system'
+}
+
+
 def get_current_module() -> Optional[str]:
     """Get the current module based on the request path."""
-    path = request.path.strip('/')
-    if path.startswith('mail'):
-        return 'mail'
-    elif path.startswith('dashboard'):
-        return 'dashboard'
-    elif path.startswith('ldap'):
-        return 'ldap'
-    elif path.startswith('auth'):
-        return 'auth'
-    elif path.startswith('system'):
-        return 'system'
-    return None
+    segment = request.path.lstrip('/').partition('/')[0]
+    return MODULES.get(segment)
 
 
 def is_active_route(route_name: str) -> bool:
@@ -99,66 +109,47 @@ def is_active_module(module_name: str) -> bool:
     return get_current_module() == module_name
 
 
-# Common breadcrumb patterns
-def set_mail_breadcrumbs(subsection: str = None, current_path: str = None):
-    """Set breadcrumbs for mail management pages."""
+# Common breadcrumb patterns: section -> (root breadcrumb text, root url)
+SECTIONS = {
+    'mail': ('Mail Management', '/mail'),
+    'dashboard': ('Dashboard', '/dashboard'),
+    'ldap': ('LDAP Management', '/ldap'),
+    'system': ('System', '/system')
+}
+
+
+def set_section_breadcrumbs(section: str, subsection: str = None, current_path: str = None):
+    """Set breadcrumbs for a section's root page, or one of its subpages."""
+    text, url = SECTIONS[section]
     breadcrumbs = [
-        {'text': 'Mail Management', 'url': '/mail'}
+        {'text': text, 'url': url}
     ]
     
     if subsection:
         breadcrumbs.append({
             'text': subsection,
-            'url': current_path or '/mail',
+            'url': current_path or url,
             'active': True
         })
     
     set_breadcrumbs(breadcrumbs)
 
 
+def set_mail_breadcrumbs(subsection: str = None, current_path: str = None):
+    """Set breadcrumbs for mail management pages."""
+    set_section_breadcrumbs('mail', subsection, current_path)
+
+
 def set_dashboard_breadcrumbs(subsection: str = None, current_path: str = None):
     """Set breadcrumbs for dashboard pages."""
-    breadcrumbs = [
-        {'text': 'Dashboard', 'url': '/dashboard'}
-    ]
-    
-    if subsection:
-        breadcrumbs.append({
-            'text': subsection,
-            'url': current_path or '/dashboard',
-            'active': True
-        })
-    
-    set_breadcrumbs(breadcrumbs)
+    set_section_breadcrumbs('dashboard', subsection, current_path)
 
 
 def set_ldap_breadcrumbs(subsection: str = None, current_path: str = None):
     """Set breadcrumbs for LDAP pages."""
-    breadcrumbs = [
-        {'text': 'LDAP Management', 'url': '/ldap'}
-    ]
-    
-    if subsection:
-        breadcrumbs.append({
-            'text': subsection,
-            'url': current_path or '/ldap',
-            'active': True
-        })
-    
-    set_breadcrumbs(breadcrumbs)
+    set_section_breadcrumbs('ldap', subsection, current_path)
 
 
 def set_system_breadcrumbs(subsection: str = None, current_path: str = None):
     """Set breadcrumbs for system pages."""
-    breadcrumbs = [
-        {'text': 'System', 'url': '/system'}
-    ]
-    
-    if subsection:
-        breadcrumbs.append({
-            'text': subsection,
-            'url': current_path or '/system',
-            'active': True
-        })
-    
-    set_breadcrumbs(breadcrumbs)
+    set_section_breadcrumbs('system', subsection, current_path)
@@ -0,0 +1,55 @@
+"""
+Password Hashing Utilities
+Hashes login passwords with Argon2id and verifies both Argon2 and legacy bcrypt hashes
+"""
+
+import os
+
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHash, VerificationError
+from argon2.low_level import hash_secret
+
+from app.extensions import bcrypt
+
+# OWASP-recommended Argon2id parameters: 46 MiB memory, 1 iteration, 1 lane
+ARGON2_PARAMS = {
+    'time_cost': 1,
+    'memory_cost': 46 * 1024,
+    'parallelism': 1,
+    'hash_len': 32,
+    'type': Type.ID
+}
+ARGON2_SALT_LEN = 16
+
+# Used for verification and rehash checks, which parse the stored parameters
+_PH = PasswordHasher(salt_len=ARGON2_SALT_LEN, **ARGON2_PARAMS)
+
+# PHC string prefix identifying Argon2 hashes
+ARGON2_PREFIX = '$argon2'
+
+
+def hash_password(password: str) -> str:
+    """Hash a password as an Argon2id PHC string."""
+    # Call libargon2 directly rather than going through PasswordHasher
+    return hash_secret(password.encode('utf-8'), os.urandom(ARGON2_SALT_LEN), **ARGON2_PARAMS).decode('ascii')
+
+
+def check_password(password_hash: str, password: str) -> bool:
+    """Check a password against an Argon2 or bcrypt hash."""
+    if password_hash.startswith(ARGON2_PREFIX):
+        try:
+            return _PH.verify(password_hash, password)
+        except (VerificationError, InvalidHash):
+            return False
+
+    try:
+        return bcrypt.check_password_hash(password_hash, password)
+    except ValueError:
+        return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """Check whether a hash should be upgraded to the current Argon2id parameters."""
+    if not password_hash.startswith(ARGON2_PREFIX):
+        return True
+    return _PH.check_needs_rehash(password_hash)
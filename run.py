@@ -8,33 +8,62 @@ Usage:
     python run.py                    # Run web app in development mode
     python run.py --web             # Run web app in development mode
     python run.py --cli             # Run CLI interface
+    python run.py --bootstrap-cli   # Create a basic CLI script if missing
     python run.py --web --port 8080 # Run web app on specific port
     python run.py --web --mode production  # Run web app in production mode
+    python run.py --web --reload    # Run web app with the auto-reloader
+
+Environment:
+    WAITRESS_THREADS                 # Worker threads in production mode (default 16)
 """
 
 import os
 import sys
 import argparse
-import subprocess
-from pathlib import Path
 
-# Load environment variables early
-try:
-    from dotenv import load_dotenv
-    # Load .env file from the project root
-    env_path = Path(__file__).parent / '.env'
-    if env_path.exists():
-        load_dotenv(env_path)
-        print(f"📋 Loaded environment from: {env_path}")
-    else:
-        print(f"⚠️  .env file not found at: {env_path}")
-except ImportError:
-    print("⚠️  python-dotenv not available, using system environment only")
-except Exception as e:
-    print(f"⚠️  Error loading .env file: {e}")
+DEFAULT_WAITRESS_THREADS = 16
+
+def get_waitress_threads():
+    """Read WAITRESS_THREADS, falling back to the default on a bad value"""
+    value = os.environ.get('WAITRESS_THREADS')
+    if value is None:
+        return DEFAULT_WAITRESS_THREADS
+    
+    try:
+        threads = int(value)
+    except ValueError:
+        threads = 0
+    
+    if threads < 1:
+        print(f"⚠️  WAITRESS_THREADS must be a positive integer, got {value!r}; "
+              f"using {DEFAULT_WAITRESS_THREADS}")
+        return DEFAULT_WAITRESS_THREADS
+    return threads
+
+def load_environment():
+    """Load environment variables from the project's .env file"""
+    from pathlib import Path
+    
+    try:
+        from dotenv import load_dotenv
+        # Load .env file from the project root
+        env_path = Path(__file__).parent / '.env'
+        if env_path.exists():
+            load_dotenv(env_path)
+            print(f"📋 Loaded environment from: {env_path}")
+        else:
+            print(f"⚠️  .env file not found at: {env_path}")
+    except ImportError:
+        print("⚠️  python-dotenv not available, using system environment only")
+    except Exception as e:
+        print(f"⚠️  Error loading .env file: {e}")
 
-def run_web_app(port=5000, host='0.0.0.0', mode='development'):
+def run_web_app(port=5000, host='0.0.0.0', mode='development', reload=False):
     """Run the Postfix Manager web application"""
+    import hashlib
+    import subprocess
+    from pathlib import Path
+    
     app_dir = Path(__file__).parent / 'app'
     
     if not app_dir.exists():
@@ -62,51 +91,52 @@ def run_web_app(port=5000, host='0.0.0.0', mode='development'):
             subprocess.run([sys.executable, '-m', 'venv', 'venv'], check=True)
             print("Virtual environment created successfully")
         
-        # Install requirements if needed
+        # Install requirements if they changed since the last install
         requirements_file = Path(__file__).parent / 'requirements.txt'
         if requirements_file.exists():
-            print("Installing/updating requirements...")
-            if os.name == 'nt':  # Windows
-                pip_cmd = [str(venv_path / 'Scripts' / 'pip')]
-            else:  # Unix/Linux/macOS
-                pip_cmd = [str(venv_path / 'bin' / 'pip')]
+            req_hash = hashlib.blake2b(requirements_file.read_bytes(), digest_size=16).hexdigest()
+            hash_file = venv_path / '.req-hash'
+            installed_hash = hash_file.read_text().strip() if hash_file.exists() else None
             
-            subprocess.run([*pip_cmd, 'install', '-r', str(requirements_file)], check=True)
-            print("Requirements installed successfully")
+            if req_hash == installed_hash:
+                print("Requirements unchanged, skipping install")
+            else:
+                print("Installing/updating requirements...")
+                if os.name == 'nt':  # Windows
+                    pip_cmd = [str(venv_path / 'Scripts' / 'pip')]
+                else:  # Unix/Linux/macOS
+                    pip_cmd = [str(venv_path / 'bin' / 'pip')]
+                
+                subprocess.run([*pip_cmd, 'install', '-r', str(requirements_file)], check=True)
+                hash_file.write_text(req_hash)
+                print("Requirements installed successfully")
+        
+        # Import the app
+        sys.path.insert(0, str(Path(__file__).parent))
+        from app import create_app
+        app = create_app()
         
         # Run the web application
         if mode == 'production':
             print("Starting production server with Waitress...")
-            if os.name == 'nt':  # Windows
-                python_cmd = [str(venv_path / 'Scripts' / 'python')]
-            else:  # Unix/Linux/macOS
-                python_cmd = [str(venv_path / 'bin' / 'python')]
-            
-            # Import and run the app
-            sys.path.insert(0, str(Path(__file__).parent))
-            from app import create_app
-            app = create_app()
             
             # Use Waitress for production
             from waitress import serve
-            serve(app, host=host, port=port)
+            serve(
+                app,
+                host=host,
+                port=port,
+                threads=get_waitress_threads(),
+                asyncore_use_poll=True,
+                connection_limit=1000
+            )
         else:
             print("Starting development server...")
-            if os.name == 'nt':  # Windows
-                python_cmd = [str(venv_path / 'Scripts' / 'python')]
-            else:  # Unix/Linux/macOS
-                python_cmd = [str(venv_path / 'bin' / 'python')]
-            
-            # Import and run the app
-            sys.path.insert(0, str(Path(__file__).parent))
-            from app import create_app
-            app = create_app()
-            
             app.run(
                 debug=True,
                 host=host,
                 port=port,
-                use_reloader=True
+                use_reloader=reload
             )
             
     except subprocess.CalledProcessError as e:
@@ -121,12 +151,17 @@ def run_web_app(port=5000, host='0.0.0.0', mode='development'):
     
     return True
 
-def run_cli():
-    """Run the Postfix Manager CLI interface"""
-    cli_script = Path(__file__).parent / 'scripts' / 'postfix_manager.py'
+CLI_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts', 'postfix_manager.py')
+
+def ensure_cli_script():
+    """Create a basic CLI script if one doesn't exist yet"""
+    from pathlib import Path
     
-    if not cli_script.exists():
-        print("ERROR: CLI script not found. Please ensure 'scripts/postfix_manager.py' exists.")
+    cli_script = Path(CLI_SCRIPT)
+    
+    if cli_script.exists():
+        print(f"CLI script already exists: {cli_script}")
+    else:
         print("Creating basic CLI script...")
         
         # Create scripts directory if it doesn't exist
@@ -179,23 +214,27 @@ if __name__ == '__main__':
         
         print("Basic CLI script created successfully")
     
+    return True
+
+def run_cli():
+    """Run the Postfix Manager CLI interface, replacing this process"""
     print("Starting Postfix Manager CLI Interface...")
-    print(f"CLI Script: {cli_script}")
+    print(f"CLI Script: {CLI_SCRIPT}")
     print()
+    sys.stdout.flush()
     
     try:
         if os.name == 'nt':  # Windows
-            subprocess.run([sys.executable, str(cli_script), '--help'], check=True)
+            os.execv(sys.executable, [sys.executable, CLI_SCRIPT, '--help'])
         else:  # Unix/Linux/macOS
-            subprocess.run([str(cli_script), '--help'], check=True)
-    except subprocess.CalledProcessError as e:
+            os.execv(CLI_SCRIPT, [CLI_SCRIPT, '--help'])
+    except FileNotFoundError:
+        print("ERROR: CLI script not found. Please ensure 'scripts/postfix_manager.py' exists.")
+        print("Run 'python run.py --bootstrap-cli' to create a basic one.")
+    except OSError as e:
         print(f"ERROR: Failed to run CLI: {e}")
-        return False
-    except KeyboardInterrupt:
-        print("\nCLI stopped by user")
-        return True
     
-    return True
+    return False
 
 def check_python_version():
     """Check if Python version is compatible"""
@@ -210,6 +249,7 @@ def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
         description="Postfix Manager Runner",
+        epilog="Set WAITRESS_THREADS to change the production worker thread count (default 16).",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
     
@@ -225,6 +265,12 @@ def main():
         help='Run the CLI interface'
     )
     
+    parser.add_argument(
+        '--bootstrap-cli',
+        action='store_true',
+        help='Create a basic CLI script if scripts/postfix_manager.py is missing'
+    )
+    
     parser.add_argument(
         '--port',
         type=int,
@@ -247,10 +293,18 @@ def main():
         help='Web application mode'
     )
     
+    parser.add_argument(
+        '--reload',
+        action='store_true',
+        help='Restart the development server when code changes'
+    )
+    
     args = parser.parse_args()
     
+    load_environment()
+    
     # If no specific mode specified, default to web
-    if not args.web and not args.cli:
+    if not args.web and not args.cli and not args.bootstrap_cli:
         args.web = True
     
     print("Postfix Manager Runner")
@@ -262,8 +316,11 @@ def main():
     
     success = True
     
-    if args.web:
-        success = run_web_app(port=args.port, host=args.host, mode=args.mode)
+    if args.bootstrap_cli:
+        success = ensure_cli_script()
+    
+    if args.web and success:
+        success = run_web_app(port=args.port, host=args.host, mode=args.mode, reload=args.reload)
     
     if args.cli and success:
         success = run_cli()
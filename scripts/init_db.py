@@ -17,8 +17,8 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from app import create_app
-from app.extensions import db
+# This script runs one short transaction, so don't build a connection pool
+os.environ.setdefault('DB_NULL_POOL', 'true')
 
 
 def init_database():
@@ -28,25 +28,33 @@ def init_database():
         print("=" * 50)
         print()
         
+        # Import the app only after the banner is shown
+        from app import create_app
+        from app.extensions import db
+        
         # Create Flask app context
         app = create_app()
         
         with app.app_context():
             print("📊 Creating database tables...")
             
-            # Create all tables
-            db.create_all()
-            
-            print("✅ Database tables created successfully!")
-            print()
-            print("📋 Created tables:")
-            
-            # Get table names
-            inspector = db.inspect(db.engine)
-            table_names = inspector.get_table_names()
+            # One lookup for existing tables rather than a check per table,
+            # then create only the missing ones in a single transaction
+            with db.engine.begin() as conn:
+                existing = set(db.inspect(conn).get_table_names())
+                missing = [table for table in db.metadata.sorted_tables if table.name not in existing]
+                if missing:
+                    db.metadata.create_all(bind=conn, tables=missing, checkfirst=False)
             
-            for table_name in table_names:
-                print(f"   • {table_name}")
+            if missing:
+                print("✅ Database tables created successfully!")
+                print()
+                print("📋 Created tables:")
+                
+                for table in missing:
+                    print(f"   • {table.name}")
+            else:
+                print("✅ Schema already present, no tables to create")
             
             print()
             print("🎉 Database initialization complete!")
@@ -12,12 +12,31 @@ Usage:
 
 import os
 import sys
+import sqlite3
 from pathlib import Path
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# This script runs one short transaction, so don't build a connection pool
+os.environ.setdefault('DB_NULL_POOL', 'true')
+
+def set_owner_and_mode(path, uid, gid, mode):
+    """Change ownership and permissions of a path through one file descriptor."""
+    if not hasattr(os, 'fchown'):
+        os.chown(path, uid, gid)
+        os.chmod(path, mode)
+        return
+    
+    # Both changes apply to the same inode even if the path is swapped in between
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    try:
+        os.fchown(fd, uid, gid)
+        os.fchmod(fd, mode)
+    finally:
+        os.close(fd)
+
 def init_vm_database():
     """Initialize the database on VM with proper paths for any database type."""
     try:
@@ -28,12 +47,14 @@ def init_vm_database():
         # Import the new database configuration system
         from app.extensions.database import DbConfig
         
-        # Get database configuration
+        # Get database configuration, read once into locals
         db_config = DbConfig()
         db_type = db_config.db_type
+        db_uri = db_config.db_uri
+        db_name = db_config.db_name
         
         print(f"📊 Database Type: {db_type}")
-        print(f"🔗 Database URI: {db_config.db_uri}")
+        print(f"🔗 Database URI: {db_uri}")
         print()
         
         # Handle SQLite-specific setup
@@ -42,71 +63,69 @@ def init_vm_database():
             db_path = "/opt/postfix-manager/app/data/db/postfix_manager.db"
             db_dir = os.path.dirname(db_path)
             
+            # Ownership is fixed to the user running this script
+            current_uid, current_gid = os.getuid(), os.getgid()
+            
             print(f"📁 Database path: {db_path}")
             print(f"📁 Database directory: {db_dir}")
             
-            # Create database directory if it doesn't exist
+            # In WAL mode every connection, readers included, needs to create or
+            # write the -wal/-shm files beside the database. The directory is
+            # therefore group-writable and setgid (2775), so members of the app's
+            # group (CLI scripts, backups) can open it and new files keep the group.
             if not os.path.exists(db_dir):
                 print(f"📁 Creating database directory: {db_dir}")
-                os.makedirs(db_dir, exist_ok=True)
+                old_umask = os.umask(0o002)
+                try:
+                    Path(db_dir).mkdir(parents=True, exist_ok=True, mode=0o775)
+                finally:
+                    os.umask(old_umask)
             
             # Fix directory permissions
             print("🔐 Fixing directory permissions...")
             try:
-                current_uid = os.getuid()
-                current_gid = os.getgid()
-                
-                # Change directory ownership to current user
-                os.chown(db_dir, current_uid, current_gid)
+                # Change directory ownership to current user, permissions to 2775 (rwxrwsr-x)
+                set_owner_and_mode(db_dir, current_uid, current_gid, 0o2775)
                 print(f"✅ Changed directory ownership to UID:{current_uid} GID:{current_gid}")
-                
-                # Set directory permissions to 755 (rwxr-xr-x)
-                os.chmod(db_dir, 0o755)
-                print("✅ Set directory permissions to 755")
-                
+                print("✅ Set directory permissions to 2775")
+                    
             except Exception as perm_error:
                 print(f"⚠️  Warning: Could not fix directory permissions: {perm_error}")
             
             # Create empty database file if it doesn't exist
             if not os.path.exists(db_path):
                 print(f"📄 Creating database file: {db_path}")
-                with open(db_path, 'w') as f:
-                    pass  # Create empty file
+                # Setting the journal mode writes a valid SQLite header right away
+                conn = sqlite3.connect(db_path)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                finally:
+                    conn.close()
             
             # Fix permissions - ensure the database file is readable/writable by the app
             print("🔐 Fixing database permissions...")
             try:
-                # Get the current user's UID and GID
-                current_uid = os.getuid()
-                current_gid = os.getgid()
-                
-                # Change ownership to current user
-                os.chown(db_path, current_uid, current_gid)
+                # Change ownership to current user, permissions to 664 (rw-rw-r--)
+                set_owner_and_mode(db_path, current_uid, current_gid, 0o664)
                 print(f"✅ Changed ownership to UID:{current_uid} GID:{current_gid}")
-                
-                # Set permissions to 644 (rw-r--r--)
-                os.chmod(db_path, 0o644)
-                print("✅ Set database file permissions to 644")
+                print("✅ Set database file permissions to 664")
                 
             except Exception as perm_error:
                 print(f"⚠️  Warning: Could not fix permissions: {perm_error}")
                 print("   This might cause issues if running as different user")
         
-        elif db_type in ['mysql', 'mariadb']:
-            print("🐬 MySQL/MariaDB detected")
-            print("📋 Please ensure the following:")
-            print(f"   • Database '{db_config.db_name}' exists")
-            print(f"   • User '{db_config.db_username}' has proper permissions")
-            print(f"   • Database server is running on {db_config.db_hostname}:{db_config.db_port}")
-            print()
-            
-        elif db_type == 'postgresql':
-            print("🐘 PostgreSQL detected")
-            print("📋 Please ensure the following:")
-            print(f"   • Database '{db_config.db_name}' exists")
-            print(f"   • User '{db_config.db_username}' has proper permissions")
-            print(f"   • Database server is running on {db_config.db_hostname}:{db_config.db_port}")
-            print()
+        elif db_type in ['mysql', 'mariadb', 'postgresql']:
+            if db_type == 'postgresql':
+                print("🐘 PostgreSQL detected")
+            else:
+                print("🐬 MySQL/MariaDB detected")
+            print("\n".join([
+                "📋 Please ensure the following:",
+                f"   • Database '{db_name}' exists",
+                f"   • User '{db_config.db_username}' has proper permissions",
+                f"   • Database server is running on {db_config.db_hostname}:{db_config.db_port}",
+                ""
+            ]))
         
         else:
             print(f"⚠️  Unsupported database type: {db_type}")
@@ -124,19 +143,32 @@ def init_vm_database():
         with app.app_context():
             print("📊 Creating database tables...")
             
-            # Create all tables
-            db.create_all()
+            # One lookup for existing tables rather than a check per table,
+            # then create only the missing ones in a single transaction
+            with db.engine.begin() as conn:
+                existing = set(db.inspect(conn).get_table_names())
+                missing = [table for table in db.metadata.sorted_tables if table.name not in existing]
+                if missing:
+                    db.metadata.create_all(bind=conn, tables=missing, checkfirst=False)
             
-            print("✅ Database tables created successfully!")
-            print()
-            print("📋 Created tables:")
-            
-            # Get table names
-            inspector = db.inspect(db.engine)
-            table_names = inspector.get_table_names()
+            if db_type == 'sqlite':
+                # journal_mode is stored in the database file, so the app keeps WAL.
+                # synchronous=NORMAL is not set here: it is a per-connection
+                # setting, so setting it in this one-shot script would not
+                # affect the app's connections.
+                print("⚡ Enabling SQLite write-ahead logging...")
+                with db.engine.connect() as conn:
+                    conn.exec_driver_sql("PRAGMA journal_mode=WAL")
             
-            for table_name in table_names:
-                print(f"   • {table_name}")
+            if missing:
+                print("✅ Database tables created successfully!")
+                print()
+                print("📋 Created tables:")
+                
+                for table in missing:
+                    print(f"   • {table.name}")
+            else:
+                print("✅ Schema already present, no tables to create")
             
             print()
             print("🎉 Database initialization complete!")
@@ -147,17 +179,25 @@ def init_vm_database():
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         print()
-        print("🔍 Troubleshooting:")
+        # Build the hints up front and write them in one go
+        lines = ["🔍 Troubleshooting:"]
         if db_type == 'sqlite':
-            print(f"1. Check if directory exists: ls -la {db_dir}")
-            print(f"2. Check if file exists: ls -la {db_path}")
-            print(f"3. Check permissions: ls -la {db_dir}")
+            lines += [
+                f"1. Check if directory exists: ls -la {db_dir}",
+                f"2. Check if file exists: ls -la {db_path}",
+                f"3. Check permissions: ls -la {db_dir}"
+            ]
         else:
-            print(f"1. Check database connection: {db_config.db_uri}")
-            print(f"2. Verify database server is running")
-            print(f"3. Check user credentials and permissions")
-        print(f"4. Check disk space: df -h")
-        print(f"5. Check Python path: {sys.path}")
+            lines += [
+                f"1. Check database connection: {db_uri}",
+                "2. Verify database server is running",
+                "3. Check user credentials and permissions"
+            ]
+        lines += [
+            "4. Check disk space: df -h",
+            f"5. Check Python path: {sys.path}"
+        ]
+        print("\n".join(lines))
         return False
 
 
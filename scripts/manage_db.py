@@ -27,39 +27,143 @@ Commands:
 import os
 import sys
 import argparse
+import functools
+import shutil
 import subprocess
+import time
+from datetime import datetime
 from pathlib import Path
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from app import create_app
-from app.extensions import db, migrate
-from app.models import User, AuditLog, MailDomain, MailUser, SystemConfig
+from app.config.env import load_env_layers
 
+# Most commands read DB_TYPE/DB_* before (or without) building the app, so
+# load the same .env layers and system app.conf the app does, first
+load_env_layers(project_root)
+
+@functools.lru_cache(maxsize=1)
+def get_app():
+    """Build the Flask app once; commands that only shell out never import it."""
+    from app import create_app
+    app = create_app()
+    
+    # Migrations and seeds can outlive a server's idle timeout; always check
+    # connections before use, even if DB_POOL_PRE_PING turned it off for the app
+    if get_db_type() != 'sqlite':
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options['pool_pre_ping'] = True
+        options.setdefault('pool_recycle', 3600)
+    
+    return app
+
+# The database type can't change during a run, so both lookups are done once
+# and every command sees the same value even if os.environ is modified later.
+# The env layers have already been loaded at the top of this module, so the
+# first (cached) lookup sees DB_TYPE from the shell, .env* or app.conf
+@functools.lru_cache(maxsize=None)
 def get_db_type():
     """Get database type from environment."""
     return os.environ.get('DB_TYPE', 'sqlite').lower()
 
+@functools.lru_cache(maxsize=None)
 def get_migration_dir():
     """Get migration directory based on database type."""
     db_type = get_db_type()
     return f'app/data/migrations/{db_type}'
 
-def run_command(cmd, cwd=None):
-    """Run a shell command and return the result."""
+@functools.lru_cache(maxsize=None)
+def get_sqlite_path():
+    """Get the SQLite database path the same way DbConfig does, without importing the app."""
+    if os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENV') == 'production':
+        default_directory = '/opt/postfix-manager/app/data/db'
+    else:
+        default_directory = str(project_root / 'app' / 'data' / 'db')
+    
+    db_directory = os.environ.get('DB_DIRECTORY') or default_directory
+    db_name = os.environ.get('DB_NAME') or 'postfix_manager.db'
+    return os.path.abspath(os.path.join(db_directory, db_name))
+
+# ioctl request that makes dst share src's extents (Btrfs, XFS and other CoW filesystems)
+FICLONE = 0x40049409
+
+def copy_file_fast(src, dst):
+    """Copy a file inside the kernel where possible: reflink, then copy_file_range, then shutil."""
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        try:
+            import fcntl
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            copied = True
+        except (ImportError, OSError):
+            copied = False
+        
+        if not copied and hasattr(os, 'copy_file_range'):
+            try:
+                remaining = os.fstat(source.fileno()).st_size
+                while remaining > 0:
+                    sent = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                    if sent == 0:
+                        break
+                    remaining -= sent
+                copied = remaining == 0
+            except OSError:
+                # e.g. NFS or cross-filesystem copies on older kernels
+                target.seek(0)
+                target.truncate()
+                source.seek(0)
+        
+        if not copied:
+            shutil.copyfileobj(source, target)
+    
+    shutil.copystat(src, dst)
+
+def run_command(cmd, cwd=None, env=None):
+    """Run a command given as an argv list and return the result."""
     try:
-        result = subprocess.run(cmd, shell=True, cwd=cwd, capture_output=True, text=True)
+        result = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
         return result.returncode == 0, result.stdout, result.stderr
     except Exception as e:
         return False, "", str(e)
 
+def run_compressed_dump(cmd, output_path, env=None):
+    """Pipe a dump command through gzip into output_path as it runs.
+    
+    output_path is removed unless both processes succeed, so a failed dump
+    never leaves an empty or truncated .gz behind.
+    """
+    dump = None
+    success = False
+    try:
+        with open(output_path, 'wb') as output:
+            dump = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            gzip = subprocess.Popen(['gzip', '-1'], stdin=dump.stdout, stdout=output)
+            dump.stdout.close()  # gzip holds the read end now
+            stderr = dump.stderr.read()
+            gzip_code = gzip.wait()
+            dump_code = dump.wait()
+        success = dump_code == 0 and gzip_code == 0
+        return success, stderr.decode(errors='replace')
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if dump is not None and dump.poll() is None:
+            dump.kill()
+            dump.wait()
+        if not success:
+            try:
+                os.unlink(output_path)
+            except OSError:
+                pass
+
 def init_database():
     """Initialize the database."""
     print("🔧 Initializing database...")
     
-    app = create_app()
+    from app.extensions import db
+    
+    app = get_app()
     with app.app_context():
         # Create all tables
         db.create_all()
@@ -73,7 +177,7 @@ def init_database():
                 os.makedirs(migration_dir, exist_ok=True)
                 
                 # Initialize Flask-Migrate
-                cmd = f"flask db init --directory {migration_dir}"
+                cmd = ['flask', 'db', 'init', '--directory', migration_dir]
                 success, stdout, stderr = run_command(cmd)
                 if success:
                     print("✅ Flask-Migrate initialized")
@@ -92,7 +196,7 @@ def create_migration(message):
         print("Run 'init' command first")
         return
     
-    cmd = f"flask db migrate --directory {migration_dir} -m '{message}'"
+    cmd = ['flask', 'db', 'migrate', '--directory', migration_dir, '-m', message]
     success, stdout, stderr = run_command(cmd)
     
     if success:
@@ -111,7 +215,7 @@ def run_migrations():
         print("Run 'init' command first")
         return
     
-    cmd = f"flask db upgrade --directory {migration_dir}"
+    cmd = ['flask', 'db', 'upgrade', '--directory', migration_dir]
     success, stdout, stderr = run_command(cmd)
     
     if success:
@@ -129,7 +233,7 @@ def show_current_version():
         print(f"❌ Migration directory not found: {migration_dir}")
         return
     
-    cmd = f"flask db current --directory {migration_dir}"
+    cmd = ['flask', 'db', 'current', '--directory', migration_dir]
     success, stdout, stderr = run_command(cmd)
     
     if success:
@@ -146,7 +250,7 @@ def show_migration_history():
         print(f"❌ Migration directory not found: {migration_dir}")
         return
     
-    cmd = f"flask db history --directory {migration_dir}"
+    cmd = ['flask', 'db', 'history', '--directory', migration_dir]
     success, stdout, stderr = run_command(cmd)
     
     if success:
@@ -165,10 +269,29 @@ def reset_database():
     
     print("🔄 Resetting database...")
     
-    app = create_app()
+    from app.extensions import db
+    
+    db_type = get_db_type()
+    app = get_app()
     with app.app_context():
-        # Drop all tables
-        db.drop_all()
+        if db_type in ['postgresql', 'mysql', 'mariadb']:
+            # Drop every existing model table with one DROP TABLE statement
+            # instead of one round-trip per table in dependency order
+            with db.engine.begin() as conn:
+                existing = set(db.inspect(conn).get_table_names())
+                quote = conn.dialect.identifier_preparer.quote
+                tables = ', '.join(quote(table.name) for table in db.metadata.sorted_tables
+                                   if table.name in existing)
+                if tables and db_type == 'postgresql':
+                    conn.exec_driver_sql(f"DROP TABLE {tables} CASCADE")
+                elif tables:
+                    conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=0")
+                    try:
+                        conn.exec_driver_sql(f"DROP TABLE {tables}")
+                    finally:
+                        conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=1")
+        else:
+            db.drop_all()
         print("✅ All tables dropped")
         
         # Recreate all tables
@@ -177,11 +300,23 @@ def reset_database():
         
         print("✅ Database reset complete")
 
+# Rows per bulk insert when seeding, so large seed sets stay bounded in memory
+SEED_BATCH_SIZE = 1000
+
+def save_in_batches(session, objects, batch_size=SEED_BATCH_SIZE):
+    """Bulk-insert objects in batches; the caller commits once at the end."""
+    for start in range(0, len(objects), batch_size):
+        session.bulk_save_objects(objects[start:start + batch_size])
+
 def seed_database():
     """Seed the database with test data."""
     print("🌱 Seeding database with test data...")
     
-    app = create_app()
+    from app.extensions import db
+    from app.models import User, MailDomain, MailUser, SystemConfig
+    from app.utils.passwords import hash_password
+    
+    app = get_app()
     with app.app_context():
         try:
             # Check if data already exists
@@ -197,17 +332,19 @@ def seed_database():
                 print("   - System config: mail_server_name")
                 return
             
+            # New rows are collected here and inserted together
+            pending = []
+            
             # Create admin user if it doesn't exist
             if not existing_admin:
-                from app.extensions import bcrypt
                 admin_user = User(
                     username='admin',
                     email='admin@example.com',
-                    password_hash=bcrypt.generate_password_hash('admin123').decode('utf-8'),
+                    password_hash=hash_password('admin123'),
                     role='ADMIN',
                     is_active=True
                 )
-                db.session.add(admin_user)
+                pending.append(admin_user)
                 print("✅ Created admin user: admin/admin123")
             else:
                 print("ℹ️  Admin user already exists")
@@ -219,12 +356,15 @@ def seed_database():
                     ldap_base_dn='dc=example,dc=com',
                     is_active=True
                 )
+                # Flush so the domain's id is available to the mail user below
                 db.session.add(test_domain)
+                db.session.flush()
+                existing_domain = test_domain
                 print("✅ Created test domain: example.com")
             else:
                 print("ℹ️  Test domain already exists")
             
-            # Create test mail user if domain exists
+            # Create test mail user for the domain
             if existing_domain:
                 existing_mail_user = MailUser.query.filter_by(username='testuser').first()
                 if not existing_mail_user:
@@ -238,7 +378,7 @@ def seed_database():
                         ldap_dn='uid=testuser,dc=example,dc=com',
                         is_active=True
                     )
-                    db.session.add(test_mail_user)
+                    pending.append(test_mail_user)
                     print("✅ Created test mail user: testuser/testpass123")
                 else:
                     print("ℹ️  Test mail user already exists")
@@ -250,11 +390,12 @@ def seed_database():
                     value='mail.example.com',
                     description='Primary mail server hostname'
                 )
-                db.session.add(system_config)
+                pending.append(system_config)
                 print("✅ Created system config: mail_server_name")
             else:
                 print("ℹ️  System config already exists")
             
+            save_in_batches(db.session, pending)
             db.session.commit()
             print("✅ Test data seeding completed successfully")
             
@@ -267,16 +408,19 @@ def backup_database():
     print("💾 Creating database backup...")
     
     db_type = get_db_type()
-    timestamp = subprocess.run(['date', '+%Y%m%d_%H%M%S'], capture_output=True, text=True).stdout.strip()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    started = time.monotonic()
     
     if db_type == 'sqlite':
-        # Use the new database configuration system
-        from app.extensions.database import DbConfig
-        db_config = DbConfig()
-        db_path = db_config.db_uri.replace('sqlite:///', '')
+        # A SQLite backup is a file copy; no need to import Flask or fork cp
+        db_path = get_sqlite_path()
         
         backup_path = f"{db_path}.backup.{timestamp}"
-        cmd = f"cp {db_path} {backup_path}"
+        try:
+            copy_file_fast(db_path, backup_path)
+            success, stderr = True, ""
+        except OSError as e:
+            success, stderr = False, str(e)
         
     elif db_type in ['mysql', 'mariadb']:
         db_name = os.environ.get('DB_NAME', 'postfix_manager')
@@ -285,8 +429,11 @@ def backup_database():
         db_username = os.environ.get('DB_USERNAME', 'root')
         db_password = os.environ.get('DB_PASSWORD', '')
         
-        backup_path = f"/tmp/postfix_manager_{timestamp}.sql"
-        cmd = f"mysqldump -h{db_hostname} -P{db_port} -u{db_username} -p{db_password} {db_name} > {backup_path}"
+        # The password goes through the environment so it doesn't show up in ps
+        backup_path = f"/tmp/postfix_manager_{timestamp}.sql.gz"
+        env = dict(os.environ, MYSQL_PWD=db_password)
+        cmd = ['mysqldump', f'-h{db_hostname}', f'-P{db_port}', f'-u{db_username}', db_name]
+        success, stderr = run_compressed_dump(cmd, backup_path, env=env)
         
     elif db_type == 'postgresql':
         db_name = os.environ.get('DB_NAME', 'postfix_manager')
@@ -295,13 +442,18 @@ def backup_database():
         db_username = os.environ.get('DB_USERNAME', 'postgres')
         db_password = os.environ.get('DB_PASSWORD', '')
         
-        backup_path = f"/tmp/postfix_manager_{timestamp}.sql"
-        cmd = f"PGPASSWORD='{db_password}' pg_dump -h{db_hostname} -p{db_port} -U{db_username} {db_name} > {backup_path}"
+        backup_path = f"/tmp/postfix_manager_{timestamp}.sql.gz"
+        env = dict(os.environ, PGPASSWORD=db_password)
+        cmd = ['pg_dump', f'-h{db_hostname}', f'-p{db_port}', f'-U{db_username}', db_name]
+        success, stderr = run_compressed_dump(cmd, backup_path, env=env)
     
-    success, stdout, stderr = run_command(cmd)
+    else:
+        print(f"❌ Backup not supported for database type: {db_type}")
+        return
     
     if success:
-        print(f"✅ Database backup created: {backup_path}")
+        size = os.path.getsize(backup_path)
+        print(f"✅ Database backup created: {backup_path} ({size:,} bytes in {time.monotonic() - started:.1f}s)")
     else:
         print(f"❌ Backup failed: {stderr}")
 
@@ -321,10 +473,12 @@ def main():
     os.environ['FLASK_APP'] = 'run.py'
     os.environ['FLASK_ENV'] = 'development'
     
-    print(f"🚀 Postfix Manager Database Manager")
-    print(f"📊 Database Type: {get_db_type()}")
-    print(f"📁 Migration Directory: {get_migration_dir()}")
-    print()
+    print("\n".join([
+        "🚀 Postfix Manager Database Manager",
+        f"📊 Database Type: {get_db_type()}",
+        f"📁 Migration Directory: {get_migration_dir()}",
+        ""
+    ]))
     
     if args.command == 'init':
         init_database()
@@ -20,16 +20,23 @@ Usage:
 import os
 import sys
 import argparse
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 # Database types supported
-DATABASE_TYPES = ['sqlite', 'mysql', 'postgresql']
+DATABASE_TYPES = ('sqlite', 'mysql', 'postgresql')
+_DATABASE_TYPE_SET = frozenset(DATABASE_TYPES)
+
+# Keeps the output of concurrent Alembic runs from interleaving
+_print_lock = threading.Lock()
 
 class MigrationManager:
     """Manages migrations across all database types."""
@@ -37,38 +44,101 @@ class MigrationManager:
     def __init__(self):
         self.project_root = Path(__file__).parent.parent
         self.migrations_dir = self.project_root / 'app' / 'data' / 'migrations'
+        self._alembic_configs = {}
+        self._database_url = None
+        self._migration_dir_problems = None
+        # Environment for Alembic subprocesses, copied once rather than per command
+        self._alembic_env = {
+            **os.environ,
+            'PYTHONPATH': str(self.project_root),
+            'FLASK_APP': 'run.py',
+            'FLASK_ENV': 'development'
+        }
         
     def get_migration_dir(self, db_type: str) -> Path:
         """Get the migration directory for a specific database type."""
         return self.migrations_dir / db_type
     
     def validate_database_type(self, db_type: str) -> bool:
-        """Validate that the database type is supported."""
-        if db_type not in DATABASE_TYPES:
+        """Validate that the database type is supported.
+        
+        Only the alembic runners call this; argparse already restricts the
+        choices, and the per-command methods all go through a runner.
+        """
+        if db_type not in _DATABASE_TYPE_SET:
             print(f"❌ Unsupported database type: {db_type}")
             print(f"   Supported types: {', '.join(DATABASE_TYPES)}")
             return False
         return True
     
+    def _scan_migration_dirs(self) -> dict:
+        """Map each database type to its migration directory problem, or None if it's usable."""
+        if self._migration_dir_problems is not None:
+            return self._migration_dir_problems
+        
+        # One scandir of the migrations root, then one per database directory,
+        # instead of three exists() calls per database on every check
+        try:
+            with os.scandir(self.migrations_dir) as entries:
+                present = {entry.name for entry in entries if entry.is_dir()}
+        except FileNotFoundError:
+            present = set()
+        
+        problems = {}
+        for db_type in DATABASE_TYPES:
+            migration_dir = self.get_migration_dir(db_type)
+            if db_type not in present:
+                problems[db_type] = f"Migration directory not found: {migration_dir}"
+                continue
+            
+            with os.scandir(migration_dir) as entries:
+                kinds = {entry.name: entry.is_dir() for entry in entries}
+            
+            if 'env.py' not in kinds:
+                problems[db_type] = f"Migration environment file not found: {migration_dir / 'env.py'}"
+            elif not kinds.get('versions'):
+                problems[db_type] = f"Migration versions directory not found: {migration_dir / 'versions'}"
+            else:
+                problems[db_type] = None
+        
+        self._migration_dir_problems = problems
+        return problems
+    
     def check_migration_dir(self, db_type: str) -> bool:
         """Check if migration directory exists and is properly configured."""
-        migration_dir = self.get_migration_dir(db_type)
+        problem = self._scan_migration_dirs()[db_type]
+        if problem:
+            print(f"❌ {problem}")
+            return False
         
-        if not migration_dir.exists():
-            print(f"❌ Migration directory not found: {migration_dir}")
+        return True
+    
+    def exec_alembic_command(self, db_type: str, command: str, args: List[str] = None) -> bool:
+        """Replace this process with an Alembic command; only returns if validation fails."""
+        if not self.validate_database_type(db_type):
             return False
         
-        env_file = migration_dir / 'env.py'
-        if not env_file.exists():
-            print(f"❌ Migration environment file not found: {env_file}")
+        if not self.check_migration_dir(db_type):
             return False
         
-        versions_dir = migration_dir / 'versions'
-        if not versions_dir.exists():
-            print(f"❌ Migration versions directory not found: {versions_dir}")
+        cmd = ['alembic', command] + (args or [])
+        print(f"🔄 Running Alembic command for {db_type}: {' '.join(cmd)}")
+        sys.stdout.flush()
+        
+        # execvpe searches the PATH of the env it is given, so check the same one
+        if shutil.which('alembic', path=self._alembic_env.get('PATH')) is None:
+            print("❌ alembic not found on PATH")
             return False
         
-        return True
+        # alembic writes straight to the terminal, with nothing buffered here
+        cwd = os.getcwd()
+        os.chdir(self.get_migration_dir(db_type))
+        try:
+            os.execvpe('alembic', cmd, self._alembic_env)
+        except OSError as e:
+            os.chdir(cwd)
+            print(f"❌ Failed to run alembic: {e}")
+            return False
     
     def run_alembic_command(self, db_type: str, command: str, args: List[str] = None) -> bool:
         """Run an Alembic command for a specific database type."""
@@ -83,156 +153,229 @@ class MigrationManager:
         
         print(f"🔄 Running Alembic command for {db_type}: {' '.join(cmd)}")
         
-        # Set environment variables for Alembic
-        env = os.environ.copy()
-        env['PYTHONPATH'] = str(self.project_root)
-        env['FLASK_APP'] = 'run.py'
-        env['FLASK_ENV'] = 'development'
+        # Stream output line by line so long migrations show progress and
+        # memory stays bounded; the prefix keeps parallel runs readable
+        with subprocess.Popen(
+            cmd,
+            cwd=migration_dir,  # Run from the migration directory
+            env=self._alembic_env,  # Pass the environment with PYTHONPATH
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        ) as proc:
+            for line in proc.stdout:
+                with _print_lock:
+                    print(f"   [{db_type}] {line}", end='')
+            returncode = proc.wait()
+        
+        with _print_lock:
+            if returncode == 0:
+                print(f"✅ {db_type} - {command} completed successfully")
+            else:
+                print(f"❌ {db_type} - {command} failed with exit code {returncode}")
+        return returncode == 0
+    
+    def get_database_url(self) -> str:
+        """Get the app's database URL, building the app only once per manager."""
+        if self._database_url is None:
+            from app import create_app
+            
+            app = create_app()
+            self._database_url = app.config.get('SQLALCHEMY_DATABASE_URI')
         
-        try:
-            result = subprocess.run(
-                cmd,
-                cwd=migration_dir,  # Run from the migration directory
-                env=env,  # Pass the environment with PYTHONPATH
-                capture_output=True,
-                text=True,
-                check=True
-            )
+        return self._database_url
+    
+    def get_alembic_config(self, db_type: str):
+        """Get the Alembic config for a database type, built once per manager."""
+        if db_type not in self._alembic_configs:
+            from alembic.config import Config
             
-            if result.stdout:
-                print(f"✅ {db_type} - {command} completed successfully")
-                if result.stdout.strip():
-                    print(f"   Output: {result.stdout.strip()}")
+            migration_dir = self.get_migration_dir(db_type)
+            config = Config(str(migration_dir / 'alembic.ini'), attributes={
+                # Keep env.py's fileConfig from replacing this process's logging
+                'configure_logger': False,
+                'database_url': self.get_database_url()
+            })
+            # alembic.ini uses paths relative to its own directory, which
+            # in-process would resolve against our cwd instead
+            config.set_main_option('script_location', str(migration_dir))
+            config.set_main_option('prepend_sys_path', str(self.project_root))
+            self._alembic_configs[db_type] = config
+        
+        return self._alembic_configs[db_type]
+    
+    def run_alembic_api(self, db_type: str, command: str, *args,
+                        cli_args: Optional[List[str]] = None, **kwargs) -> bool:
+        """Run an Alembic command in this process instead of a subprocess.
+        
+        ``cli_args`` are the command line equivalent of ``args``/``kwargs``,
+        used if alembic has to be run as an executable instead.
+        """
+        if not self.validate_database_type(db_type):
+            return False
+        
+        if not self.check_migration_dir(db_type):
+            return False
+        
+        try:
+            from alembic import command as alembic_command
+        except ImportError:
+            # Fall back to the alembic executable, which may live in another environment
+            return self.run_alembic_command(db_type, command, list(args) if cli_args is None else cli_args)
+        
+        print(f"🔄 Running Alembic command for {db_type}: alembic {' '.join([command] + (cli_args or list(args)))}")
+        
+        try:
+            getattr(alembic_command, command)(self.get_alembic_config(db_type), *args, **kwargs)
             return True
-            
-        except subprocess.CalledProcessError as e:
-            print(f"❌ {db_type} - {command} failed with exit code {e.returncode}")
-            if e.stdout:
-                print(f"   Stdout: {e.stdout.strip()}")
-            if e.stderr:
-                print(f"   Stderr: {e.stderr.strip()}")
+        except Exception as e:
+            print(f"❌ {db_type} - {command} failed: {e}")
             return False
     
+    def _run_for_all(self, action: Callable[[str], bool], on_failure: str,
+                     workers: Optional[int] = None, fail_fast: bool = False) -> int:
+        """Run an action for every database type in parallel; return the success count.
+        
+        With ``fail_fast``, databases that haven't started yet are skipped
+        after the first failure; runs already in progress are left to finish.
+        """
+        success_count = 0
+        
+        # Each action mostly waits on its own alembic subprocess
+        with ThreadPoolExecutor(max_workers=workers or len(DATABASE_TYPES)) as executor:
+            futures = {executor.submit(action, db_type): db_type for db_type in DATABASE_TYPES}
+            for future in as_completed(futures):
+                db_type = futures[future]
+                if future.result():
+                    success_count += 1
+                    continue
+                
+                with _print_lock:
+                    print(f"❌ {on_failure} {db_type}")
+                if fail_fast:
+                    skipped = [futures[f] for f in futures if f.cancel()]
+                    if skipped:
+                        with _print_lock:
+                            print(f"⏹️  Stopping early, skipped: {', '.join(skipped)}")
+                    break
+        
+        return success_count
+    
     def generate_migration(self, message: str) -> bool:
         """Generate a new migration for all database types."""
         print(f"🚀 Generating migration: {message}")
         print("=" * 50)
         
-        success_count = 0
         total_count = len(DATABASE_TYPES)
-        
-        for db_type in DATABASE_TYPES:
-            print(f"\n📊 Processing {db_type}...")
-            
-            if self.run_alembic_command(db_type, 'revision', ['--autogenerate', '-m', message]):
-                success_count += 1
-                print(f"✅ Migration generated for {db_type}")
-            else:
-                print(f"❌ Failed to generate migration for {db_type}")
-        
-        print(f"\n📊 Migration Generation Summary:")
-        print(f"   Successful: {success_count}/{total_count}")
-        print(f"   Failed: {total_count - success_count}/{total_count}")
-        
+        print(f"\n📊 Processing {', '.join(DATABASE_TYPES)}...")
+        
+        # Autogenerate in this process so the app and models are imported once
+        # and shared by every database, rather than once per alembic subprocess.
+        # alembic.context is process-global, so the databases go one at a time.
+        success_count = self._run_for_all(
+            lambda db_type: self.run_alembic_api(
+                db_type, 'revision', message=message, autogenerate=True,
+                cli_args=['--autogenerate', '-m', message]
+            ),
+            'Failed to generate migration for', workers=1
+        )
+        
+        lines = [
+            "\n📊 Migration Generation Summary:",
+            f"   Successful: {success_count}/{total_count}",
+            f"   Failed: {total_count - success_count}/{total_count}"
+        ]
         if success_count == total_count:
-            print("🎉 All migrations generated successfully!")
-            print("\n📋 Next steps:")
-            print("   1. Review generated migration files in migrations/[type]/versions/")
-            print("   2. Edit if needed (add custom logic, fix issues)")
-            print("   3. Run: python3 scripts/migrate_all.py upgrade [database_type]")
-            print("   4. Or upgrade all: python3 scripts/migrate_all.py upgrade all")
+            lines += [
+                "🎉 All migrations generated successfully!",
+                "\n📋 Next steps:",
+                "   1. Review generated migration files in migrations/[type]/versions/",
+                "   2. Edit if needed (add custom logic, fix issues)",
+                "   3. Run: python3 scripts/migrate_all.py upgrade [database_type]",
+                "   4. Or upgrade all: python3 scripts/migrate_all.py upgrade all"
+            ]
         else:
-            print("⚠️  Some migrations failed. Please check the errors above.")
+            lines.append("⚠️  Some migrations failed. Please check the errors above.")
+        print("\n".join(lines))
         
         return success_count == total_count
     
-    def upgrade_database(self, db_type: str) -> bool:
+    def upgrade_database(self, db_type: str, dry_run: bool = False,
+                         workers: Optional[int] = None, fail_fast: bool = False) -> bool:
         """Upgrade a specific database to the latest migration."""
         if db_type == 'all':
-            return self.upgrade_all_databases()
+            return self.upgrade_all_databases(dry_run, workers, fail_fast)
         
-        if not self.validate_database_type(db_type):
-            return False
+        if dry_run:
+            # Show where the database is and where it would go, without locking tables
+            print(f"🔍 Previewing {db_type} upgrade...")
+            return (self.run_alembic_command(db_type, 'current')
+                    and self.run_alembic_command(db_type, 'heads'))
         
         print(f"🔄 Upgrading {db_type} database...")
         return self.run_alembic_command(db_type, 'upgrade', ['head'])
     
-    def upgrade_all_databases(self) -> bool:
+    def upgrade_all_databases(self, dry_run: bool = False, workers: Optional[int] = None,
+                              fail_fast: bool = False) -> bool:
         """Upgrade all databases to the latest migration."""
         print("🚀 Upgrading all databases to latest migration")
         print("=" * 50)
         
-        success_count = 0
         total_count = len(DATABASE_TYPES)
+        print(f"\n📊 Upgrading {', '.join(DATABASE_TYPES)}...")
         
-        for db_type in DATABASE_TYPES:
-            print(f"\n📊 Upgrading {db_type}...")
-            
-            if self.upgrade_database(db_type):
-                success_count += 1
-            else:
-                print(f"❌ Failed to upgrade {db_type}")
+        success_count = self._run_for_all(
+            lambda db_type: self.upgrade_database(db_type, dry_run),
+            'Failed to upgrade', workers, fail_fast
+        )
         
-        print(f"\n📊 Upgrade Summary:")
-        print(f"   Successful: {success_count}/{total_count}")
-        print(f"   Failed: {total_count - success_count}/{total_count}")
+        print("\n".join([
+            "\n📊 Upgrade Summary:",
+            f"   Successful: {success_count}/{total_count}",
+            f"   Failed: {total_count - success_count}/{total_count}"
+        ]))
         
         return success_count == total_count
     
     def downgrade_database(self, db_type: str, revision: str) -> bool:
         """Downgrade a specific database to a specific revision."""
-        if not self.validate_database_type(db_type):
-            return False
-        
         print(f"🔄 Downgrading {db_type} database to revision: {revision}")
         return self.run_alembic_command(db_type, 'downgrade', [revision])
     
     def show_current(self, db_type: str) -> bool:
         """Show current migration version for a database."""
-        if not self.validate_database_type(db_type):
-            return False
-        
         print(f"📊 Current migration version for {db_type}:")
-        return self.run_alembic_command(db_type, 'current')
+        return self.run_alembic_api(db_type, 'current')
     
     def show_history(self, db_type: str) -> bool:
         """Show migration history for a database."""
-        if not self.validate_database_type(db_type):
-            return False
-        
         print(f"📊 Migration history for {db_type}:")
-        return self.run_alembic_command(db_type, 'history')
+        return self.run_alembic_api(db_type, 'history')
     
     def stamp_database(self, db_type: str, revision: str) -> bool:
         """Stamp a database with a specific revision without running migrations."""
-        if not self.validate_database_type(db_type):
-            return False
-        
         print(f"🏷️  Stamping {db_type} database with revision: {revision}")
         return self.run_alembic_command(db_type, 'stamp', [revision])
     
     def show_migration_info(self, db_type: str) -> bool:
         """Show detailed information about a migration."""
-        if not self.validate_database_type(db_type):
-            return False
-        
         print(f"📊 Migration information for {db_type}:")
-        return self.run_alembic_command(db_type, 'show', ['head'])
+        return self.run_alembic_api(db_type, 'show', 'head')
     
     def list_databases(self):
         """List all supported database types."""
-        print("📊 Supported Database Types:")
-        print("=" * 30)
+        lines = ["📊 Supported Database Types:", "=" * 30]
         
         for db_type in DATABASE_TYPES:
-            migration_dir = self.get_migration_dir(db_type)
             status = "✅ Configured" if self.check_migration_dir(db_type) else "❌ Not Configured"
-            print(f"   {db_type:12} - {status}")
+            lines.append(f"   {db_type:12} - {status}")
         
-        print(f"\n📁 Migration directories:")
+        lines.append("\n📁 Migration directories:")
         for db_type in DATABASE_TYPES:
-            migration_dir = self.get_migration_dir(db_type)
-            print(f"   {db_type:12} - {migration_dir}")
+            lines.append(f"   {db_type:12} - {self.get_migration_dir(db_type)}")
+        
+        print("\n".join(lines))
     
     def check_environment(self):
         """Check if the environment is properly configured for migrations."""
@@ -256,13 +399,18 @@ class MigrationManager:
             if self.check_migration_dir(db_type):
                 print(f"   ✅ {db_type} migration directory configured")
                 
-                # Check if there are any migration files
+                # Count migration files and find the newest in one directory pass
                 versions_dir = self.get_migration_dir(db_type) / 'versions'
-                migration_files = list(versions_dir.glob('*.py'))
+                with os.scandir(versions_dir) as entries:
+                    migration_files = [
+                        (entry.stat().st_mtime, entry.name)
+                        for entry in entries
+                        if entry.name.endswith('.py') and entry.is_file()
+                    ]
                 print(f"   📁 Migration files: {len(migration_files)}")
                 
                 if migration_files:
-                    print(f"   📋 Latest: {max(migration_files, key=lambda x: x.stat().st_mtime).name}")
+                    print(f"   📋 Latest: {max(migration_files)[1]}")
             else:
                 print(f"   ❌ {db_type} migration directory not configured")
         
@@ -284,9 +432,18 @@ Examples:
   # Upgrade all databases
   python3 scripts/migrate_all.py upgrade all
   
+  # Upgrade one database at a time, stopping at the first failure
+  python3 scripts/migrate_all.py upgrade all --parallel 1 --fail-fast
+  
+  # Preview an upgrade without running it
+  python3 scripts/migrate_all.py upgrade all --dry-run
+  
   # Show current version for all databases
   python3 scripts/migrate_all.py current all
   
+  # Show history, letting alembic write directly to the terminal
+  python3 scripts/migrate_all.py history sqlite --exec
+  
   # Check environment
   python3 scripts/migrate_all.py check
         """
@@ -298,7 +455,7 @@ Examples:
     ], help='Migration command to execute')
     
     parser.add_argument('database_type', nargs='?', 
-                       choices=DATABASE_TYPES + ['all'],
+                       choices=[*DATABASE_TYPES, 'all'],
                        help='Database type (or "all" for upgrade)')
     
     parser.add_argument('revision', nargs='?', 
@@ -307,6 +464,19 @@ Examples:
     parser.add_argument('-m', '--message', 
                        help='Migration message (for generate command)')
     
+    parser.add_argument('--parallel', type=int, metavar='N',
+                       help='Databases to upgrade at once with "upgrade all" (default: all of them)')
+    
+    parser.add_argument('--fail-fast', action='store_true',
+                       help='With "upgrade all", skip databases not yet started after the first failure')
+    
+    parser.add_argument('--dry-run', action='store_true',
+                       help='For upgrade, show current and head revisions instead of upgrading')
+    
+    parser.add_argument('--exec', action='store_true',
+                       help='For current/history/show/stamp/downgrade on one database, '
+                            'hand the process over to alembic')
+    
     args = parser.parse_args()
     
     # Initialize migration manager
@@ -316,8 +486,20 @@ Examples:
     os.environ['FLASK_APP'] = 'run.py'
     os.environ['FLASK_ENV'] = 'development'
     
-    print("🚀 Postfix Manager - Unified Migration Manager")
-    print("=" * 50)
+    print("🚀 Postfix Manager - Unified Migration Manager\n" + "=" * 50)
+    
+    # Nothing follows a single-database passthrough, so alembic can take over
+    if args.exec and args.database_type not in (None, 'all'):
+        alembic_args = {
+            'current': [],
+            'history': [],
+            'show': ['head'],
+            'stamp': [args.revision],
+            'downgrade': [args.revision]
+        }.get(args.command)
+        if alembic_args is not None and None not in alembic_args:
+            manager.exec_alembic_command(args.database_type, args.command, alembic_args)
+            return
     
     try:
         if args.command == 'check':
@@ -338,7 +520,7 @@ Examples:
                 print("❌ Database type is required for upgrade command")
                 print("Usage: python3 scripts/migrate_all.py upgrade [database_type|all]")
                 return
-            manager.upgrade_database(args.database_type)
+            manager.upgrade_database(args.database_type, args.dry_run, args.parallel, args.fail_fast)
             
         elif args.command == 'downgrade':
             if not args.database_type or not args.revision:
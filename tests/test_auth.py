@@ -126,6 +126,27 @@ class TestPasswordSecurity:
             # Test that password_hash is required
             assert user.password_hash is not None
 
+    def test_argon2id_hash_round_trip(self, app):
+        """Test that new hashes are Argon2id and verify correctly."""
+        from app.utils.passwords import hash_password, check_password, needs_rehash
+
+        password_hash = hash_password('testpassword')
+        assert password_hash.startswith('$argon2id$')
+        assert check_password(password_hash, 'testpassword')
+        assert not check_password(password_hash, 'wrong')
+        assert not needs_rehash(password_hash)
+
+    def test_legacy_bcrypt_hash_still_verifies(self, app):
+        """Test that existing bcrypt hashes verify and are flagged for rehash."""
+        from app.extensions import bcrypt
+        from app.utils.passwords import check_password, needs_rehash
+
+        with app.app_context():
+            password_hash = bcrypt.generate_password_hash('testpassword').decode('utf-8')
+            assert check_password(password_hash, 'testpassword')
+            assert not check_password(password_hash, 'wrong')
+            assert needs_rehash(password_hash)
+
 
 class TestSessionManagement:
     """Test session management functionality."""
@@ -4,6 +4,11 @@ Unit tests for mail management module
 
 import pytest
 import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 from app.models import MailDomain, MailUser, AuditLog
 
@@ -285,3 +290,399 @@ class TestErrorHandling:
             data = json.loads(response.data)
             assert data['success'] is False
             assert 'message' in data
+
+
+class TestMailManagerCaching:
+    """Test caching helpers in the mail manager."""
+    
+    def test_ttl_cache_expires_entries(self):
+        """Test that cached entries expire after the TTL."""
+        from app.utils.mail_manager import _TTLCache
+        
+        cache = _TTLCache(maxsize=10, ttl=60)
+        cache.set('key', 'value')
+        assert cache.get('key') == 'value'
+        
+        with patch('app.utils.mail_manager.time.monotonic', return_value=time.monotonic() + 120):
+            assert cache.get('key') is None
+    
+    def test_ttl_cache_evicts_least_recently_used(self):
+        """Test that the cache evicts the least recently used entry."""
+        from app.utils.mail_manager import _TTLCache
+        
+        cache = _TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+    
+    def test_ttl_cache_per_entry_ttl(self):
+        """Test that an entry can be given its own TTL."""
+        from app.utils.mail_manager import _TTLCache
+        
+        cache = _TTLCache(maxsize=10, ttl=5)
+        cache.set('short', 1)
+        cache.set('long', 2, ttl=300)
+        
+        with patch('app.utils.mail_manager.time.monotonic', return_value=time.monotonic() + 60):
+            assert cache.get('short') is None
+            assert cache.get('long') == 2
+
+
+class TestQueueSpoolScan:
+    """Test the spool scan used for queue size and age."""
+    
+    def test_scan_spool_walks_hashed_subdirectories(self, tmp_path):
+        """Test that files in nested queue directories are counted."""
+        from app.utils.mail_manager import _scan_spool
+        
+        nested = tmp_path / 'A' / 'B'
+        nested.mkdir(parents=True)
+        (nested / 'msg1').write_bytes(b'x' * 2048)
+        old_msg = tmp_path / 'msg2'
+        old_msg.write_bytes(b'y' * 1024)
+        two_hours_ago = time.time() - 7200
+        os.utime(old_msg, (two_hours_ago, two_hours_ago))
+        
+        size, oldest, newest = _scan_spool(str(tmp_path))
+        
+        assert size == 3072
+        assert oldest >= 7200
+        assert newest < 7200
+    
+    def test_scan_spool_sums_multiple_queues(self, tmp_path):
+        """Test that several queue directories are scanned together."""
+        from app.utils.mail_manager import _scan_spool
+        
+        for name in ('incoming', 'deferred'):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / 'msg').write_bytes(b'z' * 512)
+        
+        size, _, _ = _scan_spool(str(tmp_path / 'incoming'), str(tmp_path / 'deferred'))
+        
+        assert size == 1024
+    
+    def test_scan_spool_empty_directory(self, tmp_path):
+        """Test that an empty spool reports zero size and ages."""
+        from app.utils.mail_manager import _scan_spool
+        
+        assert _scan_spool(str(tmp_path)) == (0, 0.0, 0.0)
+    
+    def test_count_size_and_emptiness_cover_the_same_queues(self, tmp_path):
+        """Test that every spool reader sees maildrop and hold messages."""
+        from app.utils.mail_manager import PostfixManager, QUEUE_DIRS, _scan_spool, _spool_is_empty
+        
+        for name in QUEUE_DIRS:
+            (tmp_path / name).mkdir()
+        with patch('app.utils.mail_manager.QUEUE_SPOOL_DIR', str(tmp_path)):
+            assert _spool_is_empty() is True
+            
+            (tmp_path / 'maildrop' / 'msg1').write_bytes(b'a' * 100)
+            (tmp_path / 'hold' / 'A').mkdir()
+            (tmp_path / 'hold' / 'A' / 'msg2').write_bytes(b'b' * 200)
+            
+            assert _spool_is_empty() is False
+            assert PostfixManager()._fast_queue_count() == 2
+            assert _scan_spool()[0] == 300
+
+
+class TestQueueSnapshot:
+    """Test parsing postqueue -j output into queue totals."""
+    
+    def snapshot(self, command, **kwargs):
+        """Run _queue_snapshot with postqueue replaced by the given command."""
+        from app.utils import mail_manager
+        
+        stream_command = mail_manager._stream_command
+        with patch('app.utils.mail_manager._stream_command',
+                   lambda cmd, timeout: stream_command(command, timeout)):
+            return mail_manager.PostfixManager._queue_snapshot(**kwargs)
+    
+    def test_totals_and_preview(self, tmp_path):
+        """Test counts, sizes, ages and multi-recipient previews; bad lines are skipped."""
+        now = time.time()
+        listing = tmp_path / 'postqueue.json'
+        listing.write_text('\n'.join([
+            json.dumps({'queue_name': 'deferred', 'queue_id': 'ABC123', 'arrival_time': now - 7200,
+                        'message_size': 1000, 'sender': 'a@example.com',
+                        'recipients': [{'address': 'b@example.com'}, {'address': 'c@example.com'}]}),
+            'postqueue: warning: not json',
+            json.dumps({'queue_name': 'active', 'queue_id': 'DEF456', 'arrival_time': now - 60,
+                        'message_size': 500, 'sender': 'd@example.com', 'recipients': []}),
+            ''
+        ]))
+        
+        snapshot = self.snapshot(['cat', str(listing)], preview_messages=1)
+        
+        assert snapshot['count'] == 2
+        assert snapshot['size'] == 1500
+        assert snapshot['oldest_age'] >= 7200
+        assert 60 <= snapshot['newest_age'] < 7200
+        assert len(snapshot['preview']) == 1
+        assert 'ABC123' in snapshot['preview'][0]
+        assert 'b@example.com, c@example.com' in snapshot['preview'][0]
+        assert snapshot['truncated'] is True
+    
+    def test_empty_queue(self, tmp_path):
+        """Test that an empty listing gives zero totals."""
+        listing = tmp_path / 'postqueue.json'
+        listing.write_text('')
+        
+        snapshot = self.snapshot(['cat', str(listing)])
+        
+        assert snapshot['count'] == 0
+        assert snapshot['oldest_age'] == 0
+        assert snapshot['truncated'] is False
+    
+    def test_postqueue_failure_raises(self):
+        """Test that a failed postqueue run raises with its stderr."""
+        with pytest.raises(RuntimeError, match='fatal: queue not readable'):
+            self.snapshot(['sh', '-c', 'echo "fatal: queue not readable" >&2; exit 75'])
+
+
+class TestMailConnectionCount:
+    """Test counting Dovecot client connections from /proc/net/tcp."""
+    
+    def test_counts_established_mail_ports_only(self, tmp_path):
+        """Test that only established connections to local mail ports count."""
+        from app.utils.mail_manager import _count_mail_connections
+        
+        proc_tcp = tmp_path / 'tcp'
+        proc_tcp.write_text(
+            "  sl  local_address rem_address   st tx_queue rx_queue\n"
+            "   0: 0100007F:008F 0100007F:C350 01 00000000:00000000\n"  # 143 established
+            "   1: 00000000:03E1 00000000:0000 0A 00000000:00000000\n"  # 993 listening
+            "   2: 0100007F:0016 0100007F:008F 01 00000000:00000000\n"  # remote 143
+            "   3: 0100007F:03E3 0100007F:C351 01 00000000:00000000\n"  # 995 established
+        )
+        
+        with patch('app.utils.mail_manager._PROC_NET_TCP', (str(proc_tcp), str(tmp_path / 'missing'))):
+            assert _count_mail_connections() == 2
+
+
+class TestQueueJobs:
+    """Test background queue jobs."""
+    
+    def test_job_runs_and_reports_result(self):
+        """Test that a started job can be polled to completion."""
+        from app.utils.mail_manager import PostfixManager
+        
+        manager = PostfixManager()
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value.returncode = 0
+            job = manager.start_job('rebuild_queue_index')
+            assert job['success'] is True
+            
+            for _ in range(100):
+                status = PostfixManager.get_job_status(job['job_id'])
+                if status['status'] == 'done':
+                    break
+                time.sleep(0.01)
+        
+        assert status['status'] == 'done'
+        assert status['result'] is True
+    
+    def test_rejects_unknown_operation_and_job(self):
+        """Test that only whitelisted operations and known ids are accepted."""
+        from app.utils.mail_manager import PostfixManager
+        
+        assert 'error' in PostfixManager().start_job('restore_config')
+        assert 'error' in PostfixManager.get_job_status('missing')
+
+
+class TestPostsuperBatches:
+    """Test batched postsuper calls for queue messages."""
+    
+    def test_ids_go_to_one_postsuper_on_stdin(self):
+        """Test that several ids are handled by a single postsuper run."""
+        from app.utils.mail_manager import PostfixManager
+        
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value.returncode = 0
+            mock_run.return_value.stdout = ''
+            result = PostfixManager().delete_messages(['ABC123', 'DEF456', 'GHI789'])
+        
+        assert result['success'] is True
+        assert result['message'] == '3 messages deleted successfully'
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0] == ['postsuper', '-d', '-']
+        assert mock_run.call_args[1]['input'] == 'ABC123\nDEF456\nGHI789\n'
+    
+    def test_failure_reports_postsuper_stderr(self):
+        """Test that a failed batch is reported with postsuper's message."""
+        from app.utils.mail_manager import PostfixManager
+        
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value.returncode = 1
+            mock_run.return_value.stderr = 'postsuper: DEF456: no such file'
+            result = PostfixManager().hold_messages(['ABC123', 'DEF456'])
+        
+        assert result['success'] is False
+        assert result['error'] == 'postsuper: DEF456: no such file'
+        assert mock_run.call_args[0][0] == ['postsuper', '-h', '-']
+
+
+class TestVirtualDomains:
+    """Test editing the Postfix virtual_domains file."""
+    
+    def make_manager(self, tmp_path, content):
+        """Create a manager over a temporary config dir with the given domains file."""
+        from app.utils.mail_manager import PostfixManager
+        
+        (tmp_path / 'main.cf').write_text(f'virtual_alias_domains = {tmp_path / "virtual_domains"}\n')
+        (tmp_path / 'virtual_domains').write_text(content)
+        return PostfixManager(config_dir=str(tmp_path))
+    
+    def test_add_domain_appends_after_missing_newline(self, tmp_path):
+        """Test that a domain is appended on its own line."""
+        manager = self.make_manager(tmp_path, '# managed\nexample.com')
+        
+        with patch.object(manager, '_schedule_reload') as schedule:
+            assert manager.add_domain('example.org') is True
+            assert manager.add_domain('example.org') is True
+        
+        assert (tmp_path / 'virtual_domains').read_text() == '# managed\nexample.com\nexample.org\n'
+        assert schedule.call_count == 1
+    
+    def test_remove_domain_keeps_other_lines_mode_and_owner(self, tmp_path):
+        """Test that removing a domain rewrites the file in place of the original."""
+        manager = self.make_manager(tmp_path, '# managed\nexample.com\nexample.org\n')
+        domains_file = tmp_path / 'virtual_domains'
+        os.chmod(domains_file, 0o640)
+        before = os.stat(domains_file)
+        
+        with patch.object(manager, '_schedule_reload'), \
+                patch('app.utils.mail_manager.os.fchown', wraps=os.fchown) as fchown:
+            assert manager.remove_domain('example.com') is True
+        
+        assert fchown.call_args[0][1:] == (before.st_uid, before.st_gid)
+        after = os.stat(domains_file)
+        assert domains_file.read_text() == '# managed\nexample.org\n'
+        assert after.st_mode & 0o777 == 0o640
+        assert (after.st_uid, after.st_gid) == (before.st_uid, before.st_gid)
+        assert [p.name for p in tmp_path.iterdir() if p.name.startswith('.virtual_domains.')] == []
+        assert manager.get_virtual_domains() == ['example.org']
+    
+    def test_external_edits_are_picked_up(self, tmp_path):
+        """Test that the cached domain list is reloaded when the file changes."""
+        manager = self.make_manager(tmp_path, 'example.com\n')
+        assert manager.get_virtual_domains() == ['example.com']
+        
+        with open(tmp_path / 'virtual_domains', 'a') as f:
+            f.write('example.net\n')
+        
+        assert manager.get_virtual_domains() == ['example.com', 'example.net']
+        assert manager.has_virtual_domain('example.net') is True
+
+
+class TestMainCfVirtualDomains:
+    """Test adding the virtual_alias_domains setting to main.cf."""
+    
+    def update(self, tmp_path, content):
+        """Run the main.cf update over the given content and return the result."""
+        from app.utils.mail_manager import PostfixManager
+        
+        main_cf = tmp_path / 'main.cf'
+        main_cf.write_text(content)
+        PostfixManager(config_dir=str(tmp_path))._update_main_cf_virtual_domains()
+        return main_cf.read_text()
+    
+    def test_appends_when_absent(self, tmp_path):
+        """Test that the setting is added when only the legacy line is present."""
+        legacy = f'virtual_domains = hash:{tmp_path / "virtual_domains"}\n'
+        
+        result = self.update(tmp_path, legacy)
+        
+        assert result.startswith(legacy)
+        assert f'\nvirtual_alias_domains = {tmp_path / "virtual_domains"}\n' in result
+    
+    def test_appends_when_commented_out(self, tmp_path):
+        """Test that a commented-out setting doesn't count."""
+        result = self.update(tmp_path, '#virtual_alias_domains = example.com\n')
+        
+        assert f'\nvirtual_alias_domains = {tmp_path / "virtual_domains"}\n' in result
+    
+    def test_leaves_existing_setting(self, tmp_path):
+        """Test that a setting already naming the file is left alone."""
+        content = f'virtual_alias_domains =\n    {tmp_path / "virtual_domains"}\n'
+        
+        assert self.update(tmp_path, content) == content
+    
+    def test_warns_about_other_value(self, tmp_path):
+        """Test that a setting without the managed file is kept, with a warning."""
+        content = 'virtual_alias_domains = example.com\n'
+        
+        with patch('app.utils.mail_manager.logger') as logger:
+            assert self.update(tmp_path, content) == content
+        
+        assert 'domains added here will not be used' in logger.warning.call_args[0][0]
+
+
+class TestDomainReloads:
+    """Test the debounced Postfix reload after domain changes."""
+    
+    def make_manager(self, tmp_path):
+        """Create a manager over a temporary config dir with an empty domains file."""
+        from app.utils.mail_manager import PostfixManager
+        
+        (tmp_path / 'main.cf').write_text(f'virtual_alias_domains = {tmp_path / "virtual_domains"}\n')
+        (tmp_path / 'virtual_domains').write_text('')
+        return PostfixManager(config_dir=str(tmp_path))
+    
+    def test_burst_of_changes_reloads_once(self, tmp_path):
+        """Test that several quick domain changes cause a single reload."""
+        manager = self.make_manager(tmp_path)
+        
+        with patch('app.utils.mail_manager.RELOAD_DEBOUNCE_SECONDS', 0.05), \
+                patch.object(manager, 'reload_config', return_value=True) as reload_config:
+            for i in range(5):
+                assert manager.add_domain(f'example{i}.com') is True
+            time.sleep(0.3)
+        
+        assert reload_config.call_count == 1
+    
+    def test_batch_changes_reloads_once(self, tmp_path):
+        """Test that a batch reloads once, when it ends."""
+        manager = self.make_manager(tmp_path)
+        
+        with patch.object(manager, 'reload_config', return_value=True) as reload_config:
+            with manager.batch_changes():
+                manager.add_domain('example.com')
+                manager.remove_domain('example.com')
+                assert reload_config.call_count == 0
+        
+        assert reload_config.call_count == 1
+    
+    def test_flush_pending_returns_reload_result(self, tmp_path):
+        """Test that flushing runs the pending reload now and reports failure."""
+        manager = self.make_manager(tmp_path)
+        
+        with patch.object(manager, 'reload_config', return_value=False) as reload_config:
+            manager.add_domain('example.com')
+            assert manager.flush_pending() is False
+            assert reload_config.call_count == 1
+            
+            # Nothing left to run
+            assert manager.flush_pending() is True
+            assert reload_config.call_count == 1
+    
+    def test_pending_reload_runs_before_exit(self, tmp_path):
+        """Test that a short-lived process still reloads after its last change."""
+        self.make_manager(tmp_path)
+        marker = tmp_path / 'reloaded'
+        script = (
+            "import sys\n"
+            "from app.utils.mail_manager import PostfixManager\n"
+            "PostfixManager.reload_config = lambda self: open(sys.argv[2], 'w').close() or True\n"
+            "PostfixManager(config_dir=sys.argv[1]).add_domain('example.com')\n"
+        )
+        
+        result = subprocess.run([sys.executable, '-c', script, str(tmp_path), str(marker)],
+                                cwd=Path(__file__).parent.parent, capture_output=True, text=True)
+        
+        assert result.returncode == 0, result.stderr
+        assert marker.exists()
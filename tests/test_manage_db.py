@@ -0,0 +1,58 @@
+"""
+Unit tests for the database management script
+"""
+
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPT = PROJECT_ROOT / 'scripts' / 'manage_db.py'
+
+
+def load_manage_db():
+    """Import a fresh copy of manage_db.py, running its module-level setup."""
+    spec = importlib.util.spec_from_file_location('manage_db_under_test', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestDatabaseType:
+    """Test how manage_db.py picks up the database type."""
+    
+    def test_db_type_from_dotenv_only(self, tmp_path):
+        """Test that DB_TYPE set only in .env is seen by the cached lookups."""
+        (tmp_path / 'scripts').mkdir()
+        (tmp_path / 'app' / 'config').mkdir(parents=True)
+        shutil.copy(SCRIPT, tmp_path / 'scripts' / 'manage_db.py')
+        for name in ('__init__.py', 'config/__init__.py', 'config/env.py'):
+            shutil.copy(PROJECT_ROOT / 'app' / name, tmp_path / 'app' / name)
+        (tmp_path / '.env').write_text('DB_TYPE=mysql\n')
+        
+        env = {key: value for key, value in os.environ.items() if key != 'DB_TYPE'}
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import manage_db; print(manage_db.get_db_type()); print(manage_db.get_migration_dir())'],
+            cwd=tmp_path / 'scripts', env=env, capture_output=True, text=True
+        )
+        
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ['mysql', 'app/data/migrations/mysql']
+    
+    def test_db_type_from_system_config(self, tmp_path, monkeypatch):
+        """Test that DB_TYPE set only in app.conf is seen, as it is by the app."""
+        app_conf = tmp_path / 'app.conf'
+        app_conf.write_text('DB_TYPE=postgresql\n')
+        monkeypatch.delenv('DB_TYPE', raising=False)
+        
+        with patch('app.config.env.SYSTEM_CONFIG', app_conf):
+            manage_db = load_manage_db()
+        
+        assert manage_db.get_db_type() == 'postgresql'
+        assert manage_db.get_migration_dir() == 'app/data/migrations/postgresql'